@@ -0,0 +1,315 @@
+"""
+Бенчмарки ruphonetic на корпусах авторов из ruphonetic/authors/*/examples.
+
+Замеряются: импорт пакета и загрузка словаря словоформ и модели spaCy
+(холодный старт), расстановка ударений (теггер spaCy + словарь), каждая
+стадия транскрипции и быстрый движок, функции спектра и динамики, загрузка
+индекса авторов и определение автора — на нескольких размерах входа.
+Для каждого замера — лучшее время из --repeat прогонов, пропускная
+способность (символов и слов в секунду) и пиковая память по tracemalloc.
+
+    python benchmarks/run_benchmarks.py [--sizes 10000,100000] [--repeat 3]
+        [--json results.json] [--compare baseline.json] [--only spectre]
+
+Результаты с --json можно сравнить со следующим прогоном через --compare:
+для каждого замера печатается отношение времени к базовому.
+
+Бюджет импорта проверяется при каждом прогоне, а отдельно — так:
+
+    python benchmarks/run_benchmarks.py --check-import
+
+import ruphonetic в свежем интерпретаторе должен укладываться в
+IMPORT_BUDGET секунд (лучшее из нескольких запусков). После него
+в sys.modules не должно быть spacy, matplotlib и numpy, а словарь
+словоформ и модель spaCy не должны быть загружены. При нарушении
+скрипт завершается с кодом 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import ruphonetic  # noqa: E402
+from ruphonetic import transcriptor  # noqa: E402
+from ruphonetic.accentuation import stress  # noqa: E402
+
+DEFAULT_SIZES = (10000, 100000, 500000)
+DEFAULT_AUTHORS = ("pushkin", "blok", "bryusov", "fet", "mayakovskiy", "lermontov", "tyutchev", "ahmatova", "tsvetayeva")
+
+# Бюджет времени import ruphonetic (секунды) и модули, которых после
+# импорта не должно быть в sys.modules (см. README, «Ленивая загрузка и прогрев»)
+IMPORT_BUDGET = 0.2
+IMPORT_RUNS = 5
+HEAVY_MODULES = ("spacy", "matplotlib", "numpy")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import ruphonetic
+seconds = time.perf_counter() - start
+from ruphonetic.accentuation import stress
+print(json.dumps({
+    "seconds": seconds,
+    "modules": [name for name in %r if name in sys.modules],
+    "wordforms_loaded": stress._wordforms is not None,
+    "spacy_model_loaded": stress.ru_nlp is not None,
+}))
+""" % (HEAVY_MODULES,)
+
+# Стадии транскрипции в порядке transcriptor.transcribe (engine="regex")
+STAGES = tuple((name, function) for name, _, function in transcriptor.STAGES + transcriptor.SIMPLIFY_STAGES)
+
+
+def load_corpus(authors: List[str]) -> str:
+    """Корпуса авторов подряд (utf-8 или cp1251, как в author_builder)."""
+    from ruphonetic.author_builder import _read_source
+    texts = []
+    for author in authors:
+        for path in sorted((ROOT / "ruphonetic" / "authors" / author / "examples").glob("*.txt")):
+            _, encoding = _read_source(path)
+            texts.append(path.read_text(encoding=encoding))
+    return "\n".join(texts)
+
+
+def sample(corpus: str, size: int) -> str:
+    """Первые size символов корпуса, обрезанные по концу строки."""
+    if size >= len(corpus):
+        return corpus
+    end = corpus.rfind("\n", 0, size)
+    return corpus[:end if end > 0 else size]
+
+
+class Runner:
+    def __init__(self, repeat: int, memory: bool, only: Optional[List[str]]):
+        self.repeat = repeat
+        self.memory = memory
+        self.only = only
+        self.results: List[Dict[str, Any]] = []
+
+    def wanted(self, name: str) -> bool:
+        return not self.only or any(part in name for part in self.only)
+
+    def measure(
+        self,
+        name: str,
+        function: Callable[[], Any],
+        text: str = "",
+        repeat: Optional[int] = None,
+        memory: bool = True
+    ) -> Any:
+        if not self.wanted(name):
+            return None
+        best = float("inf")
+        result = None
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - start)
+        peak = None
+        if self.memory and memory:
+            tracemalloc.start()
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        words = len(text.split())
+        row = {
+            "name": name,
+            "chars": len(text),
+            "words": words,
+            "seconds": best,
+            "chars_per_sec": len(text) / best if text and best else None,
+            "words_per_sec": words / best if words and best else None,
+            "peak_memory": peak,
+        }
+        self.results.append(row)
+        print(format_row(row), flush=True)
+        return result
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    def rate(value: Optional[float]) -> str:
+        return f"{value:>12,.0f}" if value else f"{'-':>12}"
+    memory = f"{row['peak_memory'] / 2**20:>9.1f}" if row["peak_memory"] is not None else f"{'-':>9}"
+    return f"{row['name']:<40} {row['chars']:>9} {row['seconds']:>10.4f} {rate(row['chars_per_sec'])} " \
+           f"{rate(row['words_per_sec'])} {memory}"
+
+
+def check_import_budget(budget: float = IMPORT_BUDGET, runs: int = IMPORT_RUNS) -> List[str]:
+    """
+    Импортирует ruphonetic в свежих интерпретаторах и проверяет бюджет:
+    лучшее время импорта не больше budget, тяжёлые модули не загружены.
+    :return: список нарушений (пустой — бюджет соблюдён)
+    """
+    probes = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], check=True, cwd=ROOT,
+                                capture_output=True, text=True).stdout
+        probes.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(probe["seconds"] for probe in probes)
+    print(f"import ruphonetic: {best:.4f} с (бюджет {budget} с)")
+    problems = []
+    if best > budget:
+        problems.append(f"import ruphonetic занимает {best:.3f} с при бюджете {budget} с")
+    probe = probes[-1]
+    if probe["modules"]:
+        problems.append("после import ruphonetic загружены модули: " + ", ".join(probe["modules"]))
+    if probe["wordforms_loaded"]:
+        problems.append("import ruphonetic загружает словарь словоформ")
+    if probe["spacy_model_loaded"]:
+        problems.append("import ruphonetic загружает модель spaCy")
+    for problem in problems:
+        print(f"НАРУШЕН БЮДЖЕТ ИМПОРТА: {problem}")
+    return problems
+
+
+def cold_start(runner: Runner) -> None:
+    """Импорт в отдельном процессе, затем загрузка словаря и модели spaCy."""
+    command = [sys.executable, "-c", "import ruphonetic"]
+    runner.measure("startup/import", lambda: subprocess.run(command, check=True, cwd=ROOT), memory=False)
+
+    def load_dictionary():
+        stress.release()
+        stress.preload()
+    runner.measure("startup/dictionary", load_dictionary, repeat=1, memory=False)
+
+    def load_spacy():
+        stress.ru_nlp = None
+        stress.get_nlp()
+    runner.measure("startup/spacy", load_spacy, repeat=1, memory=False)
+
+
+def run_size(runner: Runner, text: str) -> None:
+    size = len(text)
+
+    def name(part: str) -> str:
+        return f"{part}@{size}"
+
+    accented = runner.measure(name("accentuate"), lambda: transcriptor.accentuate(text), text)
+    if accented is None:
+        accented = transcriptor.accentuate(text)
+
+    stage_input = accented
+    for stage, function in STAGES:
+        output = runner.measure(name(f"stage/{stage}"), lambda s=stage_input, f=function: f(s), text)
+        stage_input = output if output is not None else function(stage_input)
+
+    from ruphonetic import fast_transcriptor
+    runner.measure(name("fast/transcribe_accentuated"),
+                   lambda: fast_transcriptor.transcribe_accentuated(accented, simplify=True), text)
+    runner.measure(name("transcribe/regex"), lambda: ruphonetic.transcribe(text, simplify=True), text)
+
+    def transcribe_fast_cold():
+        # Кэш словоформ переживает вызовы: без очистки мерили бы повторный прогон
+        ruphonetic.clear_word_cache()
+        return ruphonetic.transcribe(text, simplify=True, engine="fast")
+    runner.measure(name("transcribe/fast"), transcribe_fast_cold, text)
+    runner.measure(name("transcribe/fast_warm_cache"),
+                   lambda: ruphonetic.transcribe(text, simplify=True, engine="fast"), text)
+
+    simplified = ruphonetic.transcribe(text, simplify=True, engine="fast")
+    runner.measure(name("spectre/sound_spectre"),
+                   lambda: ruphonetic.sound_spectre(simplified, input_is_transcribed=True), text)
+    runner.measure(name("spectre/sound_spectre_grouped"),
+                   lambda: ruphonetic.sound_spectre_grouped(simplified, input_is_transcribed=True), text)
+    runner.measure(name("dynamics/position_w50"),
+                   lambda: ruphonetic.sound_spectre_dynamic_position(simplified, 50, input_is_transcribed=True), text)
+    runner.measure(name("dynamics/length"),
+                   lambda: ruphonetic.sound_spectre_dynamic_length(simplified, input_is_transcribed=True), text)
+    runner.measure(name("dynamics/length_log100"),
+                   lambda: ruphonetic.sound_spectre_dynamic_length(simplified, input_is_transcribed=True,
+                                                                  log_checkpoints=100), text)
+
+    from ruphonetic.author_index import get_author_index
+    spectre = ruphonetic.sound_spectre(simplified, input_is_transcribed=True)
+    index = get_author_index()
+    runner.measure(name("identify/rank"), lambda: index.identify([spectre]), text)
+    runner.measure(name("identify/end_to_end"),
+                   lambda: ruphonetic.identify_author_by_sound_spectre(text, engine="fast"), text)
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {row["name"]: row for row in json.load(f)["results"]}
+    print(f"\nСравнение с {baseline_path} (время / базовое время):")
+    for row in results:
+        old = baseline.get(row["name"])
+        if old and old["seconds"]:
+            ratio = row["seconds"] / old["seconds"]
+            mark = "  медленнее" if ratio > 1.1 else "  быстрее" if ratio < 0.9 else ""
+            print(f"{row['name']:<40} {ratio:>7.2f}x{mark}")
+
+
+def metadata() -> Dict[str, Any]:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                  text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "revision": revision,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки ruphonetic на корпусах авторов")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="размеры входа в символах через запятую")
+    parser.add_argument("--authors", default=",".join(DEFAULT_AUTHORS), help="корпуса авторов через запятую")
+    parser.add_argument("--repeat", type=int, default=3, help="прогонов на замер (берётся лучший)")
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пиковую память")
+    parser.add_argument("--only", default=None, help="только замеры, в имени которых есть подстроки (через запятую)")
+    parser.add_argument("--json", type=Path, default=None, help="записать результаты в JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="сравнить с результатами из JSON")
+    parser.add_argument("--check-import", action="store_true",
+                        help="только проверить бюджет импорта (код выхода 1 при нарушении)")
+    args = parser.parse_args(argv)
+
+    if args.check_import:
+        sys.exit(1 if check_import_budget() else 0)
+    budget_problems = check_import_budget()
+
+    runner = Runner(args.repeat, not args.no_memory, args.only.split(",") if args.only else None)
+    corpus = load_corpus(args.authors.split(","))
+    print(f"Корпус: {len(corpus)} символов, {len(corpus.split())} слов")
+    print(f"{'замер':<40} {'символов':>9} {'сек':>10} {'символов/с':>12} {'слов/с':>12} {'пик, МБ':>9}")
+
+    cold_start(runner)
+    for size in (int(size) for size in args.sizes.split(",")):
+        run_size(runner, sample(corpus, size))
+
+    max_rss = None
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss *= 1 if sys.platform == "darwin" else 1024  # в Linux — в килобайтах
+        print(f"Максимальный RSS процесса: {max_rss / 2**20:.1f} МБ")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"metadata": metadata(), "max_rss": max_rss, "results": runner.results},
+                      f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(runner.results, args.compare)
+    if budget_problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,297 @@
 import re
-import json
-import math
-from pathlib import Path
 from ruphonetic import utils
-from collections import Counter
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
 from ruphonetic.transcriptor import transcribe as _transcribe
+from ruphonetic.transcriptor import transcribe_stream as _transcribe_stream
+from ruphonetic.transcriptor import STREAM_CHUNK_SIZE
+from ruphonetic.accentuation import stress as _stress
+from ruphonetic.cache import word_cache as _word_cache
+from ruphonetic import disk_cache as _disk_cache
+from ruphonetic import instrumentation as _instrumentation
 
-def transcribe(text: str, simplify: bool = False, verbose: bool = False) -> str:
+if TYPE_CHECKING:
+    from ruphonetic.dynamics import LengthSpectres, SpectreWindows, WindowSpectres
+    from ruphonetic.phonemes import PhonemeSequence
+    from ruphonetic.streaming import StreamIdentification
+    from ruphonetic.groupings import Grouping, GroupingInput
+    from ruphonetic.columnar import SpectreTable
+    from ruphonetic.session import TranscriptionSession
+
+# Тексты длиннее порога транскрибируются по фрагментам (spaCy не принимает
+# документы длиннее 1 000 000 символов)
+MAX_TEXT_LENGTH = 1000000
+
+# Строка или поток кусков текста (например, открытый файл)
+TextInput = Union[str, Iterable[str]]
+
+def warmup() -> None:
+    """
+    Заранее загружает модель spaCy и словарь словоформ.
+    По умолчанию они загружаются лениво, при первом вызове, которому нужны;
+    сервисы, готовые заплатить эту цену при старте, вызывают warmup() один раз.
+    """
+    _stress.preload()
+    _stress.get_nlp()
+
+def transcribe(text: str, simplify: bool = False, verbose: bool = False, engine: str = "regex") -> str:
     """
     Транскрибирует текст по русским правилам фонетики.
     :param text: исходный текст
     :param simplify: применять ли упрощённые правила
+    :param engine: "regex" или "fast" — пословный движок с тем же результатом
     :return: транскрибированный текст
     """
-    if len(text) > 1000000:
-        print("WARNING! text is too long. Transcribing only first 1000000 symbols")
-        text = text[:1000000]
-    return _transcribe(text, simplify=simplify, verbose=verbose)
+    cache = _disk_cache.disk_cache
+    if cache is not None and not verbose:
+        key = cache.key("transcription", text, simplify=simplify, accentuation=_stress.get_mode(), engine=engine)
+        result = cache.get(key)
+        if _instrumentation.enabled():
+            found = int(result is not None)
+            _instrumentation.emit("disk_cache", 0.0, len(text), len(result or ""), {"hits": found, "misses": 1 - found})
+        if result is None:
+            result = _transcribe_uncached(text, simplify, verbose, engine)
+            cache.put(key, result)
+        return result
+    return _transcribe_uncached(text, simplify, verbose, engine)
+
+def _transcribe_uncached(text: str, simplify: bool, verbose: bool, engine: str) -> str:
+    if len(text) > MAX_TEXT_LENGTH:
+        return "".join(_transcribe_stream([text], simplify=simplify, engine=engine))
+    return _transcribe(text, simplify=simplify, verbose=verbose, engine=engine)
+
+def transcribe_stream(
+    texts: Iterable[str],
+    simplify: bool = False,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    engine: str = "regex"
+) -> Iterator[str]:
+    """
+    Потоковая транскрипция текста любой длины с ограниченным расходом памяти.
+    :param texts: итерируемый набор кусков текста (например, открытый файл)
+    :param simplify: применять ли упрощённые правила
+    :param chunk_size: примерный размер фрагмента в символах
+    :param engine: движок транскрипции, см. transcribe
+    :return: генератор транскрибированных фрагментов; их склейка равна
+        транскрипции цельного текста
+    """
+    return _transcribe_stream(texts, simplify=simplify, chunk_size=chunk_size, engine=engine)
+
+def transcription_session(text: str = "", simplify: bool = False, engine: str = "regex") -> "TranscriptionSession":
+    """
+    Сессия инкрементальной транскрипции для редактора (см. session): хранит
+    ударения, транскрипцию и счётчики фонем по строкам, а после правки
+    пересчитывает только изменённые строки и их соседей.
+    """
+    from ruphonetic.session import TranscriptionSession
+    return TranscriptionSession(text, simplify=simplify, engine=engine)
+
+def configure_word_cache(capacity: Optional[int] = None, policy: Optional[str] = None) -> None:
+    """
+    Настраивает кэш транскрипций словоформ движка engine="fast"
+    (классический движок и расстановка ударений кэш не используют, см. cache).
+    :param capacity: максимальное число словоформ в кэше, 0 — отключить кэш
+    :param policy: политика вытеснения, "lru" или "fifo"
+    """
+    _word_cache.configure(capacity=capacity, policy=policy)
+
+def word_cache_stats() -> Dict[str, Any]:
+    """
+    Статистика кэша словоформ: hits, misses, hit_rate, evictions, size,
+    capacity и policy.
+    """
+    return _word_cache.stats()
+
+def clear_word_cache() -> None:
+    """Очищает кэш словоформ и обнуляет его статистику."""
+    _word_cache.clear()
+
+def configure_accentuation(mode: str) -> None:
+    """
+    Режим расстановки ударений для процесса:
+    "spacy" (по умолчанию) — весь текст размечается теггером spaCy;
+    "dictionary" — слова берутся прямо из словаря словоформ, а spaCy
+    запускается только на строках с заглавными словами, ударение которых
+    зависит от того, имя ли это собственное. Результат отличается лишь для
+    слов, которые spaCy счёл бы именами собственными, хотя они написаны
+    строчными или с заглавной только в начале строки.
+    """
+    _stress.set_mode(mode)
+
+def enable_disk_cache(path: Optional[str] = None, max_size: int = _disk_cache.DEFAULT_MAX_SIZE) -> None:
+    """
+    Включает постоянный кэш транскрипций и спектров на диске (SQLite).
+    Ключ — хэш текста, параметров и версии правил и словаря, так что
+    изменение правил само делает старые записи недействительными.
+    :param path: файл базы (по умолчанию results.sqlite в пользовательском кэше)
+    :param max_size: предельный объём в байтах, сверх него вытесняются
+        давно не читавшиеся записи
+    """
+    _disk_cache.enable(path, max_size)
+
+def disable_disk_cache() -> None:
+    """Выключает постоянный кэш (записи на диске сохраняются)."""
+    _disk_cache.disable()
+
+def disk_cache_stats() -> Dict[str, Any]:
+    """
+    Статистика постоянного кэша: hits, misses, hit_rate, evictions,
+    entries, size, max_size и path ({} если кэш выключен).
+    """
+    cache = _disk_cache.disk_cache
+    return cache.stats() if cache is not None else {}
+
+def clear_disk_cache() -> None:
+    """Удаляет все записи постоянного кэша."""
+    cache = _disk_cache.disk_cache
+    if cache is not None:
+        cache.clear()
+
+def _cached_spectre(kind: str, text: TextInput, input_is_transcribed: bool, engine: str, compute) -> Dict[str, float]:
+    """Спектр строки из постоянного кэша или compute() с сохранением в кэш."""
+    cache = _disk_cache.disk_cache
+    if cache is None or not isinstance(text, str):
+        return compute()
+    key = cache.key(kind, text, input_is_transcribed=input_is_transcribed, accentuation=_stress.get_mode(), engine=engine)
+    result = cache.get_json(key)
+    if result is None:
+        result = compute()
+        cache.put_json(key, result)
+    return result
+
+def _transcribed_chunks(text: TextInput, input_is_transcribed: bool, engine: str = "regex") -> Iterator[str]:
+    """
+    Фрагменты упрощённой транскрипции строки или потока текста.
+    Последняя буква фрагмента придерживается до следующего, чтобы
+    знак мягкости ' не оторвался от своей согласной на стыке.
+    """
+    if isinstance(text, str):
+        yield text if input_is_transcribed else transcribe(text, simplify=True, engine=engine)
+        return
+    chunks = text if input_is_transcribed else transcribe_stream(text, simplify=True, engine=engine)
+    carry = ""
+    for chunk in chunks:
+        chunk = carry + chunk
+        carry = "" if chunk.endswith("'") else chunk[-1:]
+        yield chunk[:len(chunk) - len(carry)]
+    yield carry
+
+def compile_grouping(groups: "GroupingInput") -> "Grouping":
+    """
+    Компилирует группировку {название: [звуки]} в groupings.Grouping —
+    таблицу принадлежности фонем группам. Её можно переиспользовать
+    в sound_spectre_grouped_custom и sound_spectre_groupings, сохранять
+    в JSON (to_dict/from_dict) и передавать в другие процессы.
+    """
+    from ruphonetic.groupings import compile_grouping as _compile
+    return _compile(groups)
+
+def sound_spectre_groupings(
+    texts: Iterable[TextInput],
+    groupings: Dict[str, "GroupingInput"],
+    input_is_transcribed: bool = False,
+    engine: str = "regex"
+) -> List[Dict[str, Dict[str, float]]]:
+    """
+    Доли групп сразу нескольких группировок для набора текстов: каждый
+    текст транскрибируется и разбирается один раз, а все группировки
+    считаются одним умножением матриц (см. groupings).
+    :param groupings: {название группировки: {группа: [звуки]} или Grouping}
+    :return: по тексту — {название группировки: {группа: доля}} в порядке texts
+    """
+    import numpy as np
+    from ruphonetic.groupings import evaluate_groupings
+    from ruphonetic.phonemes import N_PHONEMES
+    counts = [_phoneme_counts(text, input_is_transcribed, engine)[0] for text in texts]
+    matrix = np.array(counts, dtype=np.int64).reshape(len(counts), N_PHONEMES)
+    return evaluate_groupings(matrix, groupings)
+
+def phoneme_sequence(text: str, input_is_transcribed: bool = False, engine: str = "regex") -> "PhonemeSequence":
+    """
+    Разбирает упрощённую транскрипцию текста в PhonemeSequence: массив
+    номеров фонем (uint8, индексы в phonemes.PHONEMES) и границы слов.
+    По нему спектры считаются без повторного разбора строки.
+    """
+    from ruphonetic.phonemes import PhonemeSequence
+    if not input_is_transcribed:
+        text = transcribe(text, simplify=True, engine=engine)
+    return PhonemeSequence.from_transcription(text)
+
+def _phoneme_counts(text: TextInput, input_is_transcribed: bool, engine: str = "regex"):
+    """
+    Счётчики фонем (вектор по phonemes.PHONEMES) и позиции их первых
+    вхождений для строки или потока текста.
+    """
+    import numpy as np
+    from ruphonetic.phonemes import N_PHONEMES, PhonemeSequence
+    counts = np.zeros(N_PHONEMES, dtype=np.int64)
+    first = np.full(N_PHONEMES, np.iinfo(np.intp).max)
+    offset = 0
+    for chunk in _transcribed_chunks(text, input_is_transcribed, engine):
+        sequence = PhonemeSequence.from_transcription(chunk)
+        chunk_counts = sequence.counts()
+        counts += chunk_counts
+        # first_positions() даёт len(фрагмента) для фонем, которых во фрагменте
+        # нет: со сдвигом это была бы ложная позиция, поэтому такие фонемы
+        # остаются с прежним значением (по умолчанию — максимальным)
+        present = chunk_counts > 0
+        first[present] = np.minimum(first[present], sequence.first_positions()[present] + offset)
+        offset += len(sequence)
+    return counts, first
 
 def sound_spectre(
-    text: str, 
+    text: TextInput, 
     input_is_transcribed: bool = False, 
     show_plot: bool = False, 
     show_pie_plot: bool = False, 
-    show_bar_plot: bool = False
+    show_bar_plot: bool = False,
+    engine: str = "regex"
 ) -> Dict[str, float]:
     """
     Возвращает частотный спектр звуков (фонем) в тексте.
     По умолчанию, применяется русская фонетика.
+    Текст можно передать потоком (например, открытым файлом) — тогда он
+    транскрибируется по фрагментам, а счётчики накапливаются по ходу.
+    engine — движок транскрипции, см. transcribe.
     """
-    if not input_is_transcribed:
-        text = transcribe(text, simplify=True)
-    # Регулярка: любая русская буква в нижнем регистре, возможно с мягкостью (апостроф)
-    sounds = re.findall(r"[а-я]'?", text)
-    total = len(sounds)
-    if not total:
+    def compute() -> Dict[str, float]:
+        from ruphonetic import phonemes as _phonemes
+        # Фонема — любая русская буква в нижнем регистре, возможно с мягкостью (апостроф)
+        counts, first = _phoneme_counts(text, input_is_transcribed, engine)
+        return _phonemes.spectre_from_counts(counts, first)  # сортировка по убыванию доли
+
+    result = _cached_spectre("sound_spectre", text, input_is_transcribed, engine, compute)
+    if not result:
         return {}  # Пустой ввод — пустой результат
-    result = {sound: count / total for sound, count in Counter(sounds).items()}
-    result = dict(sorted(result.items(), key=lambda item: item[1], reverse=True)) # сортировка по значению (ascending)
     utils.show_plots(result, show_plot, show_pie_plot, show_bar_plot)
 
     return result
 
-def sound_spectre_grouped(
-    text: str, 
-    input_is_transcribed: bool = False, 
-    show_plot: bool = False, 
-    show_pie_plot: bool = False, 
-    show_bar_plot: bool = False
-) -> Dict[str, float]:
-    """
-    Группировка по типам фонем (свистящие, шипящие, твёрдые, мягкие).
-    Версия 2026: учтена классификация Ц и всегда мягких/твёрдых звуков.
-    """
-    if not input_is_transcribed:
-        # Предполагаем, что ваша функция transcribe возвращает символы с апострофом ' 
-        # для мягких звуков (например, л', ч', щ')
-        text = transcribe(text, simplify=True)
+# Группы sound_spectre_grouped — шаблоны над упрощённой транскрипцией:
+# 1. СВИСТЯЩИЕ: з, з', с, с', ц (Ц всегда твёрдый, но свистящий)
+# 2. ШИПЯЩИЕ: ж, ш, щ', ч' (Ж, Ш всегда твёрдые; Щ, Ч всегда мягкие)
+# 3. ТВЁРДЫЕ:
+# - всегда твёрдые: ж, ш, ц
+# - парные твёрдые: б, в, г, д, з, к, л, м, n, п, р, с, т, ф, х (без следующего ')
+# Используем негативную проверку (?![яёюие']) если работаем с текстом,
+# но так как у нас ТРАНСКРИПЦИЯ, проверяем только отсутствие апострофа.
+# 4. МЯГКИЕ:
+# - всегда мягкие: й', ч', щ' (или й, если он без ')
+# - парные мягкие: любой согласный с апострофом
+GROUP_PATTERNS = {
+    "свистящие": r"з'?|с'?|ц",
+    "шипящие": r"ж|ш|щ'|ч'",
+    "твердые": r"[бвгдзклмнпрстфх](?!')|ж|ш|ц",
+    "мягкие": r"[бвгдзклмнпрстфх]'|й'?|ч'|щ'",
+}
 
-    # 1. СВИСТЯЩИЕ: з, з', с, с', ц (Ц всегда твёрдый, но свистящий)
-    whistling_pat = r"з'?|с'?|ц"
-    
-    # 2. ШИПЯЩИЕ: ж, ш, щ', ч' (Ж, Ш всегда твёрдые; Щ, Ч всегда мягкие)
-    hissing_pat = r"ж|ш|щ'|ч'"
-
-    # 3. ТВЁРДЫЕ:
-    # - всегда твёрдые: ж, ш, ц
-    # - парные твёрдые: б, в, г, д, з, к, л, м, n, п, р, с, т, ф, х (без следующего ')
-    # Используем негативную проверку (?![яёюие']) если работаем с текстом, 
-    # но так как у нас ТРАНСКРИПЦИЯ, проверяем только отсутствие апострофа.
-    hard_pat = r"[бвгдзклмнпрстфх](?!')|ж|ш|ц"
-
-    # 4. МЯГКИЕ:
-    # - всегда мягкие: й', ч', щ' (или й, если он без ')
-    # - парные мягкие: любой согласный с апострофом
-    soft_pat = r"[бвгдзклмнпрстфх]'|й'?|ч'|щ'"
-
-    # Подсчёт совпадений
-    whistling_count = len(re.findall(whistling_pat, text))
-    hissing_count = len(re.findall(hissing_pat, text))
-    hard_count = len(re.findall(hard_pat, text))
-    soft_count = len(re.findall(soft_pat, text))
+def _grouped_spectre(counts) -> Dict[str, float]:
+    """Групповой спектр по вектору счётчиков фонем (см. sound_spectre_grouped)."""
+    # Подсчёт совпадений (транскрипция ожидается с апострофом ' для мягких
+    # звуков, например л', ч', щ'): шаблоны не выходят за пределы фонемы,
+    # поэтому совпадения считаются за один проход через матрицу принадлежности
+    from ruphonetic import phonemes as _phonemes
+    membership = _phonemes.membership_matrix(list(GROUP_PATTERNS.values()))
+    whistling_count, hissing_count, hard_count, soft_count = (membership @ counts).tolist()
 
     # Суммируем для нормализации (пропорции)
     # Важно: один звук может быть и свистящим, и твёрдым (например, Ц). 
@@ -97,6 +307,27 @@ def sound_spectre_grouped(
         "твердые":   safe_div(hard_count),
         "мягкие":    safe_div(soft_count)
     }
+    return result
+
+def sound_spectre_grouped(
+    text: TextInput, 
+    input_is_transcribed: bool = False, 
+    show_plot: bool = False, 
+    show_pie_plot: bool = False, 
+    show_bar_plot: bool = False,
+    engine: str = "regex"
+) -> Dict[str, float]:
+    """
+    Группировка по типам фонем (свистящие, шипящие, твёрдые, мягкие).
+    Версия 2026: учтена классификация Ц и всегда мягких/твёрдых звуков.
+    Как и sound_spectre, принимает строку или поток кусков текста.
+    """
+
+    def compute() -> Dict[str, float]:
+        counts, _ = _phoneme_counts(text, input_is_transcribed, engine)
+        return _grouped_spectre(counts)
+
+    result = _cached_spectre("sound_spectre_grouped", text, input_is_transcribed, engine, compute)
 
     utils.show_plots(result, show_plot, show_pie_plot, show_bar_plot)
         
@@ -108,18 +339,30 @@ def sound_spectre_grouped_custom(
     input_is_transcribed: bool = False,
     show_plot: bool = False,
     show_pie_plot: bool = False,
-    show_bar_plot: bool = False
+    show_bar_plot: bool = False,
+    engine: str = "regex",
+    groups: Optional["GroupingInput"] = None
 ) -> Dict[str, float]:
     """
-    Кастомная группировка фонем — пользователь вводит группы вручную через консоль.
+    Кастомная группировка фонем. Группы передаются в groups — словарём
+    {название: [звуки]} (например {"губные": ["п", "б", "м"]}) или готовой
+    groupings.Grouping; без groups пользователь вводит их вручную через консоль.
     Правильное применение требует ввода на русском, можно мягкость с апострофом.
     """
+    from ruphonetic import phonemes as _phonemes
+    if groups is not None:
+        from ruphonetic.groupings import compile_grouping
+        counts, _ = _phoneme_counts(text, input_is_transcribed, engine)
+        result = compile_grouping(groups).spectre(counts)
+        utils.show_plots(result, show_plot, show_pie_plot, show_bar_plot)
+        return result
     if not input_is_transcribed:
-        text = transcribe(text, simplify=True)
+        text = transcribe(text, simplify=True, engine=engine)
+    counts = _phonemes.PhonemeSequence.from_transcription(text).counts()
 
     print(text)
     group_num = 1
-    groups: Dict[int, Dict[str, Any]] = {}
+    console_groups: Dict[int, Dict[str, Any]] = {}
     entries_sum = 0
     print("Введите группы звуков, разделяя звуки знаком |, без пробелов. Напишите /s если Вы ввели все группы.")
 
@@ -137,24 +380,22 @@ def sound_spectre_grouped_custom(
         if len(set(sounds)) != len(sounds):
             print("В группах не могут повторяться одни и те же звуки.")
             continue
-        # Составляем regexp: подбирает указанную букву с опциональным апострофом
-        # Вариант: поочерёдно искать каждую фонему в тексте 
-        entries = []
-        for s in sounds:
-            entries.extend(re.findall(r"{}".format(re.escape(s)), text))
-        groups[group_num] = {
+        # Каждый звук ищется как подстрока: буква без апострофа захватывает
+        # и мягкий вариант; считаем по счётчикам фонем, а не по тексту
+        entries_count = int((_phonemes.sounds_membership([sounds]) @ counts)[0])
+        console_groups[group_num] = {
             'input': user_input,
             'sounds': sounds,
-            'entries': entries
+            'entries_count': entries_count
         }
-        entries_sum += len(entries)
+        entries_sum += entries_count
         group_num += 1
 
     # Формирование результата с подсчётом нормализованных частот
     result: Dict[str, float] = {}
-    for group_num in groups:
-        entries_count = len(groups[group_num]['entries'])
-        result[groups[group_num]['input']] = entries_count / entries_sum if entries_sum else 0
+    for group_num in console_groups:
+        entries_count = console_groups[group_num]['entries_count']
+        result[console_groups[group_num]['input']] = entries_count / entries_sum if entries_sum else 0
 
     utils.show_plots(result, show_plot, show_pie_plot, show_bar_plot)
     return result
@@ -162,126 +403,299 @@ def sound_spectre_grouped_custom(
 def sound_spectre_dynamic_position(
     text: str, 
     word_amount: int, 
-    input_is_transcribed: bool = False
-) -> Dict[int, Dict[str, Any]]:
+    input_is_transcribed: bool = False,
+    engine: str = "regex",
+    stride: int = 1,
+    return_substrings: bool = False
+) -> "WindowSpectres":
     """
     Возвращает спектры звуков по 'скользящему окну' размера word_amount по словам.
+    Окно сдвигается на stride слов; счётчики фонем окна обновляются по
+    вошедшим и вышедшим словам, а не пересчитываются заново.
+    :return: WindowSpectres — список фонем phonemes, номера первых слов окон
+        starts и матрица numpy spectres (окна × фонемы) с долями фонем;
+        substrings (тексты окон) — только при return_substrings=True
     """
+    from ruphonetic import dynamics
     if not input_is_transcribed:
-        text = transcribe(text, simplify=True)
-    words = text.replace("\n", " ").split(" ")
-    if word_amount > len(words):
-        raise IndexError("Количество слов в окне превышает общее число слов в тексте")
-    result: Dict[int, Dict[str, Any]] = {}
-
-    for i in range(0, len(words) - word_amount + 1):
-        substring = " ".join(words[i:i+word_amount])
-        substring_spectre = sound_spectre(substring, input_is_transcribed=True)
-        result[i] = {
-            'substring': substring,
-            'result': substring_spectre
-        }
-
-    return result
+        text = transcribe(text, simplify=True, engine=engine)
+    return dynamics.window_spectres(text, word_amount, stride=stride, with_substrings=return_substrings)
 
 def sound_spectre_dynamic_length(
     text: str, 
-    input_is_transcribed: bool = False
-) -> Dict[int, Dict[str, Any]]:
+    input_is_transcribed: bool = False,
+    engine: str = "regex",
+    step: int = 1,
+    log_checkpoints: Optional[int] = None,
+    lazy: bool = False
+) -> Union["LengthSpectres", Iterator[Tuple[int, Dict[str, float]]]]:
     """
     Возвращает спектры звуков по последовательному наращиванию длины по словам.
+    Считается по накопленным суммам счётчиков фонем, а не пересчётом каждого
+    префикса, поэтому годится и для целых книг.
+    :param step: брать каждый step-й префикс
+    :param log_checkpoints: вместо шага — столько префиксов, равномерно
+        распределённых в логарифмической шкале длины
+    :param lazy: вернуть генератор пар (длина префикса, спектр-словарь),
+        не хранящий истории
+    :return: LengthSpectres — список фонем phonemes, длины префиксов lengths
+        (от 1 до числа слов - 1) и матрица numpy spectres (префиксы × фонемы)
     """
+    from ruphonetic import dynamics
     if not input_is_transcribed:
-        text = transcribe(text, simplify=True)
-    words = text.replace("\n", " ").split(" ")
-    result: Dict[int, Dict[str, Any]] = {}
-
-    # i = 1 ... len(words)-1 (не включаем всё строку сразу)
-    for i in range(1, len(words)):
-        substring = " ".join(words[0:i])
-        substring_spectre = sound_spectre(substring, input_is_transcribed=True)
-        result[i] = {
-            'substring': substring,
-            'result': substring_spectre
-        }
+        text = transcribe(text, simplify=True, engine=engine)
+    if lazy:
+        return dynamics.iter_length_spectres(text, step=step, log_checkpoints=log_checkpoints)
+    return dynamics.length_spectres(text, step=step, log_checkpoints=log_checkpoints)
 
-    return result
+def sound_spectre_windows(
+    text: str,
+    size: int,
+    unit: str = "word",
+    stride: int = 1,
+    input_is_transcribed: bool = False,
+    engine: str = "regex",
+    grouped: bool = False,
+    groups: Optional["GroupingInput"] = None
+) -> "SpectreWindows":
+    """
+    Спектры окон из size единиц с шагом stride единиц, где единица (unit) —
+    "char" (символ), "word" (слово), "line" (строка) или "stanza" (строфа,
+    строфы разделяются пустыми строками). Транскрипция разбирается один
+    раз, счётчики окон — разности накопленных сумм.
+    Транскрипция склеивает пустые строки, поэтому для строф исходный текст
+    транскрибируется по строфам, а строфы транскрипции разделяются "\n\n".
+    :param grouped: столбцы — группы sound_spectre_grouped, а не фонемы
+    :param groups: столбцы — пользовательские группы {название: [звуки]}
+        или groupings.Grouping (см. sound_spectre_grouped_custom)
+    :return: SpectreWindows — названия столбцов columns, границы окон offsets
+        (матрица int64 «окна × 2», [начало, конец) в text), доли spectres
+        (матрица float32 «окна × столбцы») и транскрипция text
+    """
+    from ruphonetic import dynamics
+    from ruphonetic import phonemes as _phonemes
+    if not input_is_transcribed:
+        if unit == "stanza":
+            stanzas = (transcribe(text[start:end], simplify=True, engine=engine).strip("\n")
+                       for start, end in dynamics.split_stanzas(text))
+            text = "\n\n".join(stanza for stanza in stanzas if stanza)
+        else:
+            text = transcribe(text, simplify=True, engine=engine)
+    membership, columns = None, None
+    if groups is not None:
+        from ruphonetic.groupings import compile_grouping
+        grouping = compile_grouping(groups)
+        membership, columns = grouping.matrix, grouping.names
+    elif grouped:
+        membership, columns = _phonemes.membership_matrix(list(GROUP_PATTERNS.values())), list(GROUP_PATTERNS)
+    return dynamics.spectre_windows(text, size, unit, stride, membership, columns)
 
-def identify_author_by_sound_spectre(text: str, grouped: bool = False) -> Dict[str, float]:
+def identify_author_by_sound_spectre(
+    text: TextInput,
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None
+) -> Dict[str, float]:
     """
     Сравнивает звуковой спектр текста со спектрами известных авторов
     и возвращает словарь с вероятностями соответствия каждому автору.
+    Спектры авторов читаются с диска один раз на процесс (см. author_index).
     
-    :param text: исходный текст для анализа
+    :param text: исходный текст для анализа (строка или поток кусков текста)
+    :param engine: движок транскрипции, см. transcribe
+    :param top_k: вернуть только top_k самых похожих авторов
     :return: словарь с ключами - именами авторов, значениями - коэффициентами схожести (float)
     """
+    from ruphonetic.author_index import get_author_index
     # Генерируем звуковой спектр для входного текста
     if grouped:
-        user_spectre = sound_spectre_grouped(text, input_is_transcribed=False)
+        user_spectre = sound_spectre_grouped(text, input_is_transcribed=False, engine=engine)
     else:
-        user_spectre = sound_spectre(text, input_is_transcribed=False)
+        user_spectre = sound_spectre(text, input_is_transcribed=False, engine=engine)
     
     if not user_spectre:
         return {}  # Пустой текст - возвращаем пустой результат
-    
-    # Находим все файлы sound_spectre.json в директориях авторов
-    authors_dir = Path(__file__).parent / "authors"
-    author_scores: Dict[str, float] = {}
-    
-    # Ищем все sound_spectre.json файлы
-    if grouped:
-        path =  "*/sound_spectres/sound_spectre_grouped.json"
-    else:
-        path = "*/sound_spectres/sound_spectre.json"
-    spectre_files = list(authors_dir.glob(path))
-    
-    for spectre_file in spectre_files:
-        # Извлекаем имя автора из пути
-        author_name = spectre_file.parent.parent.name
-        
-        try:
-            # Загружаем спектр автора
-            with open(spectre_file, 'r', encoding='utf-8') as f:
-                author_spectre = json.load(f)
-            
-            # Вычисляем косинусное сходство
-            similarity = _cosine_similarity(user_spectre, author_spectre)
-            author_scores[author_name] = similarity
-            
-        except (json.JSONDecodeError, IOError) as e:
-            # Пропускаем файлы, которые не удалось загрузить
-            continue
-    sorted_author_scores = dict(sorted(author_scores.items(), key=lambda item: item[1], reverse=True))
-    return sorted_author_scores
+
+    # Косинусное сходство со всеми авторами сразу
+    return get_author_index(grouped).identify([user_spectre], top_k=top_k)[0]
 
 def _cosine_similarity(spectre1: Dict[str, float], spectre2: Dict[str, float]) -> float:
     """
     Вычисляет косинусное сходство между двумя звуковыми спектрами.
-    
+    Оставлена для совместимости: считает тем же author_index.AuthorIndex,
+    что и identify_author_by_sound_spectre.
+
     :param spectre1: первый спектр (словарь звук -> частота)
     :param spectre2: второй спектр (словарь звук -> частота)
     :return: коэффициент сходства от 0 до 1
     """
-    # Получаем все уникальные звуки из обоих спектров
-    all_sounds = set(spectre1.keys()) | set(spectre2.keys())
-    
-    if not all_sounds:
-        return 0.0
-    
-    # Создаём векторы для всех звуков (отсутствующие звуки = 0)
-    vec1 = [spectre1.get(sound, 0.0) for sound in all_sounds]
-    vec2 = [spectre2.get(sound, 0.0) for sound in all_sounds]
-    
-    # Вычисляем скалярное произведение
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    
-    # Вычисляем нормы векторов
-    norm1 = math.sqrt(sum(a * a for a in vec1))
-    norm2 = math.sqrt(sum(b * b for b in vec2))
-    
-    # Косинусное сходство
-    if norm1 == 0.0 or norm2 == 0.0:
-        return 0.0
-    
-    similarity = dot_product / (norm1 * norm2)
-    return similarity
+    from ruphonetic.author_index import AuthorIndex
+    index = AuthorIndex.from_spectres({"": spectre2}, axis=list(dict.fromkeys([*spectre2, *spectre1])))
+    vectors, norms = index.vectorize([spectre1])
+    return float(index.scores(vectors, norms)[0, 0])
+
+def identify_authors_by_sound_spectre(
+    texts: Iterable[TextInput],
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None
+) -> List[Dict[str, float]]:
+    """
+    Пакетный вариант identify_author_by_sound_spectre: спектры всех текстов
+    сравниваются с авторами одним умножением матриц.
+    :return: список словарей {автор: сходство} в порядке texts
+        (пустой словарь для текста без звуков)
+    """
+    from ruphonetic.author_index import get_author_index
+    spectre_function = sound_spectre_grouped if grouped else sound_spectre
+    spectres = [spectre_function(text, input_is_transcribed=False, engine=engine) for text in texts]
+    results = get_author_index(grouped).identify(spectres, top_k=top_k)
+    return [result if spectre else {} for spectre, result in zip(spectres, results)]
+
+def identify_author_by_neighbours(
+    text: TextInput,
+    k: int = 25,
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    Определение автора по k ближайшим фрагментам библиотеки эталонных
+    спектров (см. reference_library): в отличие от identify_author_by_sound_spectre
+    текст сравнивается не с усреднённым спектром автора, а со спектрами
+    отдельных фрагментов его корпуса, и соседи голосуют за своих авторов.
+    Библиотеку нужно один раз собрать: python -m ruphonetic.reference_library
+    :param k: число соседей
+    :return: словарь {автор: доля голосов} по убыванию доли
+    """
+    from ruphonetic.reference_library import counts_to_vectors, get_reference_library
+    counts, _ = _phoneme_counts(text, False, engine)
+    if not counts.any():
+        return {}
+    return get_reference_library(grouped).identify(counts_to_vectors(counts, grouped), k=k, top_k=top_k)[0]
+
+def identify_author_streaming(
+    text: TextInput,
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None,
+    chunk_size: int = 20000,
+    tolerance: float = 0.1,
+    patience: int = 3,
+    min_chars: int = 0
+) -> "StreamIdentification":
+    """
+    Потоковый вариант identify_author_by_sound_spectre с ранней остановкой
+    (см. streaming): текст читается фрагментами по chunk_size символов,
+    рейтинг авторов пересчитывается после каждого фрагмента, и чтение
+    прекращается, когда patience фрагментов подряд лидер не меняется,
+    а его отрыв от второго места меняется не больше чем на долю tolerance.
+    :return: StreamIdentification: scores ({автор: сходство}), chars_read
+        (сколько символов входа прочитано), phonemes, chunks, margin
+        и complete (прочитан ли текст до конца)
+    """
+    from ruphonetic import streaming as _streaming
+    return _streaming.identify_author_streaming(
+        text, grouped=grouped, engine=engine, top_k=top_k, chunk_size=chunk_size,
+        tolerance=tolerance, patience=patience, min_chars=min_chars
+    )
+
+def export_spectres(
+    path: str,
+    texts: Union[Dict[str, str], Iterable[Tuple[str, str]]],
+    kind: str = "sound_spectre",
+    engine: str = "regex",
+    jobs: Optional[int] = None,
+    chunksize: int = 16,
+    window: Optional[Dict[str, Any]] = None
+) -> "SpectreTable":
+    """
+    Считает спектры набора текстов в пуле процессов и пишет их в столбцовое
+    хранилище path (каталог массивов .npy с индексом, см. columnar).
+    :param texts: {идентификатор: текст} или пары (идентификатор, текст)
+    :param kind: "sound_spectre", "sound_spectre_grouped" или "windows"
+    :param window: для окон — параметры sound_spectre_windows (size, unit, stride, grouped, groups)
+    :return: открытое хранилище (как open_spectres)
+    """
+    from ruphonetic import columnar
+    return columnar.export_spectres(path, texts, kind, engine, jobs, chunksize, window)
+
+def open_spectres(path: str) -> "SpectreTable":
+    """
+    Открывает столбцовое хранилище спектров: массивы читаются через mmap
+    без копирования, так что и миллион документов открывается сразу.
+    """
+    from ruphonetic import columnar
+    return columnar.open_spectres(path)
+
+def transcribe_many(
+    texts: Iterable[str],
+    simplify: bool = False,
+    engine: str = "regex",
+    jobs: Optional[int] = None,
+    chunksize: int = 1,
+    ordered: bool = True
+) -> Iterator[Any]:
+    """
+    Транскрибирует набор текстов в общем пуле процессов (см. parallel):
+    spaCy и словарь словоформ загружаются в каждом процессе один раз.
+    :param texts: итерируемый набор текстов (может быть генератором)
+    :param jobs: число процессов (по умолчанию — по числу ядер), 1 — без пула
+    :param chunksize: сколько текстов отправлять процессу за раз
+    :param ordered: True — транскрипции в порядке texts,
+        False — пары (номер текста, транскрипция) по мере готовности
+    :return: генератор результатов
+    """
+    from ruphonetic import parallel
+    return parallel.transcribe_many(texts, simplify=simplify, engine=engine, jobs=jobs,
+                                    chunksize=chunksize, ordered=ordered)
+
+def sound_spectre_many(
+    texts: Iterable[str],
+    grouped: bool = False,
+    engine: str = "regex",
+    jobs: Optional[int] = None,
+    chunksize: int = 1,
+    ordered: bool = True
+) -> Iterator[Any]:
+    """
+    Спектры набора текстов (sound_spectre или, при grouped=True,
+    sound_spectre_grouped) в общем пуле процессов. Параметры — как у transcribe_many.
+    :return: генератор спектров (или пар (номер текста, спектр) при ordered=False)
+    """
+    from ruphonetic import parallel
+    return parallel.sound_spectre_many(texts, grouped=grouped, engine=engine, jobs=jobs,
+                                       chunksize=chunksize, ordered=ordered)
+
+async def atranscribe(text: str, simplify: bool = False, engine: str = "regex") -> str:
+    """
+    Асинхронный transcribe для асинхронных сервисов: вычисление уходит
+    в общий пул, одинаковые одновременные запросы считаются один раз
+    (см. aio, настройка — aio.configure).
+    """
+    from ruphonetic import aio
+    return await aio.atranscribe(text, simplify=simplify, engine=engine)
+
+async def asound_spectre(text: str, input_is_transcribed: bool = False, engine: str = "regex") -> Dict[str, float]:
+    """Асинхронный sound_spectre (без графиков), см. atranscribe."""
+    from ruphonetic import aio
+    return await aio.asound_spectre(text, input_is_transcribed=input_is_transcribed, engine=engine)
+
+async def asound_spectre_grouped(
+    text: str,
+    input_is_transcribed: bool = False,
+    engine: str = "regex"
+) -> Dict[str, float]:
+    """Асинхронный sound_spectre_grouped (без графиков), см. atranscribe."""
+    from ruphonetic import aio
+    return await aio.asound_spectre_grouped(text, input_is_transcribed=input_is_transcribed, engine=engine)
+
+async def aidentify_author_by_sound_spectre(
+    text: str,
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None
+) -> Dict[str, float]:
+    """Асинхронный identify_author_by_sound_spectre, см. atranscribe."""
+    from ruphonetic import aio
+    return await aio.aidentify_author_by_sound_spectre(text, grouped=grouped, engine=engine, top_k=top_k)
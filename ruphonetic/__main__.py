@@ -0,0 +1,3 @@
+from ruphonetic.cli import main
+
+main()
@@ -1,24 +1,104 @@
-import spacy, pickle
+import os, threading
 
 import pathlib
 PATH = pathlib.Path(__file__).parent.resolve()
 import re
 
+from ruphonetic.accentuation import wordforms as _wordforms_index
+
+# Модель spaCy загружается при первой расстановке ударений, а не при
+# импорте пакета: import ruphonetic не должен тянуть spaCy и тем более
+# скачивать модель.
 ru_nlp = None
+_nlp_lock = threading.Lock()
+
+# Для ударений нужны только text, pos_, tag_ и whitespace_ токенов:
+# синтаксический разбор, NER и лемматизация лишь тратят время.
+UNUSED_PIPES = ["parser", "ner", "lemmatizer"]
+
+def _load_spacy_model():
+    import spacy
+    try:
+        return spacy.load('ru_core_news_md', exclude=UNUSED_PIPES)
+    except OSError:
+        print('Downloading language model for the spaCy POS tagger\n'
+            "(don't worry, this will only happen once)")
+        from spacy.cli import download
+        download('ru_core_news_md')
+        return spacy.load('ru_core_news_md', exclude=UNUSED_PIPES)
+
+def get_nlp():
+    """Возвращает общий для процесса конвейер spaCy, загружая его при первом вызове."""
+    global ru_nlp
+    if ru_nlp is None:
+        with _nlp_lock:
+            if ru_nlp is None:
+                ru_nlp = _load_spacy_model()
+    return ru_nlp
 
-try:
-    ru_nlp = spacy.load('ru_core_news_md')
-except OSError:
-    print('Downloading language model for the spaCy POS tagger\n'
-        "(don't worry, this will only happen once)")
-    from spacy.cli import download
-    download('ru_core_news_md')
-    ru_nlp = spacy.load('ru_core_news_md')
+# Словарь словоформ открывается один раз на процесс: индекс лежит в mmap
+# только для чтения, поэтому форкнутые и заново запущенные процессы
+# разделяют одни и те же страницы файла, а не держат по копии dict.
+_wordforms = None
+_stress_index = None
+_wordforms_lock = threading.Lock()
+
+def _reset_lock_after_fork():
+    global _wordforms_lock, _nlp_lock
+    _wordforms_lock = threading.Lock()
+    _nlp_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_after_fork)
 
 def load():
-    with open(file=f"{PATH}/wordforms.dat", mode='rb') as f:
-        wordforms = pickle.loads(f.read())
-    return wordforms
+    """
+    Возвращает общий для процесса словарь словоформ {слово: интерпретации}.
+    При первом вызове открывает (и при необходимости собирает) индекс
+    wordforms.idx; последующие вызовы возвращают тот же объект.
+    """
+    global _wordforms
+    if _wordforms is None:
+        with _wordforms_lock:
+            if _wordforms is None:
+                _wordforms = _wordforms_index.open_index(PATH / "wordforms.dat")
+    return _wordforms
+
+def load_stress_index():
+    """
+    Возвращает общий для процесса индекс ударений {слово: готовое ударение}
+    (wordforms.StressTable), при первом вызове собирая его из словаря
+    словоформ. Если словарь подменён обычным dict, индекса нет: None.
+    """
+    global _stress_index
+    if _stress_index is None:
+        wordforms = load()
+        if not isinstance(wordforms, _wordforms_index.StringTable):
+            return None
+        with _wordforms_lock:
+            if _stress_index is None:
+                _stress_index = _wordforms_index.open_stress_index(wordforms, derive_single_accentuation)
+    return _stress_index
+
+def preload():
+    """Заранее открывает словарь словоформ и индекс ударений, например при старте сервиса."""
+    load()
+    load_stress_index()
+
+def release():
+    """
+    Закрывает словарь словоформ и освобождает отображение файла.
+    Вызывать, когда в процессе не идёт расстановка ударений;
+    следующий вызов load() откроет словарь заново.
+    """
+    global _wordforms, _stress_index
+    with _wordforms_lock:
+        if _stress_index is not None:
+            _stress_index.close()
+            _stress_index = None
+        if _wordforms is not None:
+            _wordforms.close()
+            _wordforms = None
 
 # Гласные для проверки односложности
 RUSSIAN_VOWELS = "аеёиоуыэюя"
@@ -80,12 +160,16 @@ def accentuate_word(word):
     if ("tag" in word) and ("PROPN" in word["tag"]):
         return add_stress_single_vowel(word["token"])
 
-    if word["is_punctuation"] or (not "interpretations" in word):
+    if word["is_punctuation"] or not in_dictionary(word):
         return add_stress_single_vowel(word["token"])
     else:
         # Используем ударение из словаря только если оно однозначно
-        # во всех интерпретациях данной словоформы.
-        res = derive_single_accentuation(word["interpretations"])
+        # во всех интерпретациях данной словоформы. Из индекса ударений
+        # оно приходит уже вычисленным.
+        if "accentuation" in word:
+            res = word["accentuation"]
+        else:
+            res = derive_single_accentuation(word["interpretations"])
         if res is not None:
             return res
 
@@ -94,17 +178,39 @@ def accentuate_word(word):
         # Fallback: только односложные слова (add_stress_single_vowel).
         return add_stress_single_vowel(word["token"])
 
-def tokenize(text, wordforms):
+def in_dictionary(word):
+    return "interpretations" in word or "accentuation" in word
+
+_MISSING = object()
+
+def look_up(word, wordforms, stress_index=None):
+    """
+    Добавляет к слову словарную статью: "accentuation" из индекса ударений,
+    если он передан, иначе "interpretations" из словаря словоформ.
+    Строчная форма слова имеет приоритет над исходной.
+    """
+    token = word["token"]
+    if stress_index is not None:
+        lower = token.lower()
+        for form in (lower, token) if lower != token else (token,):
+            accentuation = stress_index.get(form, _MISSING)
+            if accentuation is not _MISSING:
+                word["accentuation"] = accentuation
+                return
+        return
+    if token in wordforms:
+        word["interpretations"] = wordforms[token]
+    if token.lower() in wordforms:
+        word["interpretations"] = wordforms[token.lower()]
+
+def tokenize(text, wordforms, doc=None, stress_index=None):
     res = []
-    doc = ru_nlp(text)
+    if doc is None:
+        doc = get_nlp()(text)
     for token in doc:
         if token.pos_ != 'PUNCT':
             word = {"token": token.text, "tag": token.tag_}
-            if word["token"] in wordforms:
-                word["interpretations"] = wordforms[word["token"]]
-            if word["token"].lower() in wordforms:
-                word["interpretations"] = wordforms[word["token"].lower()]
-            word["lemma"] = token.lemma_
+            look_up(word, wordforms, stress_index)
             word["is_punctuation"] = False
             word["uppercase"] = word["token"].upper() == word["token"]
             word["starts_with_a_capital_letter"] = word["token"][0].upper() == word["token"][0]
@@ -114,19 +220,130 @@ def tokenize(text, wordforms):
         res.append(word)
     return res
 
-def process(text, wordforms):
+def count_word(counters, word, accentuated):
+    """
+    Счётчики для ruphonetic.instrumentation по одному слову.
+    ambiguous_unstressed — слова из словаря, у которых есть гласная, но
+    словарь не дал единственного ударения; слова без гласных (в, к, с)
+    ударения не несут и не считаются.
+    """
+    if word["is_punctuation"] or not word["token"].isalpha():
+        return
+    if in_dictionary(word):
+        counters["dictionary_hits"] += 1
+        if (
+            "`" not in accentuated
+            and not ("tag" in word and "PROPN" in word["tag"])
+            and any(c.lower() in RUSSIAN_VOWELS for c in word["token"])
+        ):
+            counters["ambiguous_unstressed"] += 1
+    else:
+        counters["dictionary_misses"] += 1
+
+def restore_case(word, accentuated):
+    """Возвращает слову регистр исходного токена."""
+    if "starts_with_a_capital_letter" in word and word["starts_with_a_capital_letter"]:
+        accentuated = accentuated.capitalize()
+    if "uppercase" in word and word["uppercase"]:
+        accentuated = accentuated.upper()
+    return accentuated
+
+def process(text, wordforms, doc=None, counters=None, stress_index=None):
     res = ""
-    words = tokenize(text, wordforms)
+    words = tokenize(text, wordforms, doc, stress_index)
+    if counters is not None:
+        counters["tokens_tagged"] += len(words)
     for i in range(len(words)):
         accentuated = accentuate_word(words[i])
-        if "starts_with_a_capital_letter" in words[i] and words[i]["starts_with_a_capital_letter"]:
-            accentuated = accentuated.capitalize()
-        if "uppercase" in words[i] and words[i]["uppercase"]:
-            accentuated = accentuated.upper()
-        res += accentuated
+        if counters is not None:
+            count_word(counters, words[i], accentuated)
+        res += restore_case(words[i], accentuated)
         res += words[i]["whitespace"]
     return res
 
+# Режимы расстановки ударений: "spacy" — весь текст проходит через теггер
+# spaCy, "dictionary" — слова берутся из словаря, а теггер запускается
+# только на строках, где от его тега зависит результат
+MODES = ("spacy", "dictionary")
+_mode = "spacy"
+
+_WORD_RE = re.compile(r"[а-яА-ЯёЁ]+")
+
+def set_mode(mode):
+    """Устанавливает режим расстановки ударений для процесса (см. MODES)."""
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим расстановки ударений: {mode}. Доступны: {', '.join(MODES)}")
+    _mode = mode
+
+def get_mode():
+    return _mode
+
+def dictionary_word(token, wordforms, stress_index=None):
+    """Слово в том же виде, что и в tokenize, но без тега spaCy."""
+    word = {"token": token, "is_punctuation": False}
+    look_up(word, wordforms, stress_index)
+    word["uppercase"] = token.upper() == token
+    word["starts_with_a_capital_letter"] = token[0].upper() == token[0]
+    return word
+
+def needs_tagger(word, accentuated):
+    """
+    Зависит ли ударение слова от тега spaCy. Тег влияет только через PROPN:
+    имя собственное получает ударение лишь при единственной гласной. Для слов
+    без словарной статьи результат тот же, а имена собственные пишутся
+    с заглавной буквы — значит, теггер нужен заглавному слову из словаря,
+    у которого словарное ударение отличается от ударения имени собственного.
+    """
+    return (
+        word["starts_with_a_capital_letter"]
+        and in_dictionary(word)
+        and accentuated != add_stress_single_vowel(word["token"])
+    )
+
+def process_dictionary_first(text, wordforms, counters=None, stress_index=None):
+    """
+    Расстановка ударений в режиме "dictionary": строки, где ни одному слову
+    не нужен тег, собираются по словарю, остальные строки размечаются
+    spaCy одним прогоном nlp.pipe и обрабатываются, как в process.
+    Отличия от режима "spacy" возможны только для слов, которые spaCy счёл
+    бы именами собственными: строчных и заглавных лишь в начале строк —
+    они получат словарное ударение.
+    """
+    lines = text.split("\n")
+    line_tokens = [_WORD_RE.findall(line) for line in lines]
+    # В стихах с заглавной буквы начинается каждая строка. Заглавное слово
+    # в начале строки считаем нарицательным, если в тексте оно не встречается
+    # с заглавной буквы в середине строки, — иначе теггер почти не пропускал бы строк
+    capitalized_inside = {token for tokens in line_tokens for token in tokens[1:] if token[0].isupper()}
+    # Ударения слов в пределах вызова: стихи сильно повторяются
+    known = {}
+    tagged = []
+    for number, (line, tokens) in enumerate(zip(lines, line_tokens)):
+        parts = _WORD_RE.split(line)
+        entries = []
+        for position, token in enumerate(tokens):
+            entry = known.get(token)
+            if entry is None:
+                word = dictionary_word(token, wordforms, stress_index)
+                accentuated = accentuate_word(word)
+                entry = known[token] = (word, accentuated, needs_tagger(word, accentuated))
+            if entry[2] and (position or token in capitalized_inside):
+                tagged.append(number)
+                break
+            entries.append(entry)
+        else:
+            if counters is not None:
+                for word, accentuated, _ in entries:
+                    count_word(counters, word, accentuated)
+            result = [restore_case(word, accentuated) for word, accentuated, _ in entries]
+            lines[number] = "".join(part + accentuated for part, accentuated in zip(parts, result + [""]))
+    if tagged:
+        docs = get_nlp().pipe(lines[number] for number in tagged)
+        for number, doc in zip(tagged, docs):
+            lines[number] = process(doc.text, wordforms, doc, counters, stress_index)
+    return "\n".join(lines)
+
 def preprocess_text(text):
     # оставляет только русский текст, одиночные пробелы и переносы строк
     result = re.sub(r"[^а-яА-ЯёЁ\s\n]|\t", "", text)
@@ -134,9 +351,32 @@ def preprocess_text(text):
     result = re.sub(r"\n+", "\n", result)
     return result
 
-def accentuate(text, text_is_preprocessed=False):
+def accentuate(text, text_is_preprocessed=False, counters=None, mode=None):
+    """
+    :param counters: collections.Counter, в который добавляются tokens_tagged,
+        dictionary_hits, dictionary_misses и ambiguous_unstressed
+    :param mode: режим расстановки ударений (см. MODES), по умолчанию — set_mode
+    """
     if not text_is_preprocessed:
         text = preprocess_text(text)
     wordforms = load()
-    res = process(text, wordforms)
+    stress_index = load_stress_index()
+    if (mode or _mode) == "dictionary":
+        return process_dictionary_first(text, wordforms, counters, stress_index)
+    res = process(text, wordforms, counters=counters, stress_index=stress_index)
     return res
+
+def accentuate_many(texts, text_is_preprocessed=False, batch_size=None, n_process=1):
+    """
+    Расставляет ударения в нескольких документах за один прогон nlp.pipe.
+    :param texts: итерируемый набор текстов
+    :param batch_size: размер пакета для spaCy (None — значение по умолчанию модели)
+    :param n_process: число процессов spaCy
+    :return: генератор, по одному результату на документ в исходном порядке
+    """
+    if not text_is_preprocessed:
+        texts = (preprocess_text(text) for text in texts)
+    wordforms = load()
+    stress_index = load_stress_index()
+    for doc in get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process):
+        yield process(doc.text, wordforms, doc, stress_index=stress_index)
@@ -0,0 +1,312 @@
+"""
+Компактный индекс словоформ для расстановки ударений.
+
+Исходный словарь wordforms.dat — это pickle с dict вида
+{словоформа: [интерпретация, ...]}. Распаковка такого словаря занимает
+сотни мегабайт в каждом процессе, а счётчики ссылок Python ломают
+copy-on-write после fork. Поэтому словарь один раз перекладывается
+в отсортированную таблицу строк (wordforms.idx), которая открывается
+через mmap только на чтение: страницы файла общие для всех процессов,
+а поиск слова — бинарный поиск по смещениям.
+
+Формат файла (все числа — uint64 в порядке байт платформы):
+    заголовок: MAGIC, количество ключей N, размер и mtime исходника
+    N + 1 смещений ключей, N + 1 смещений значений
+    блок ключей (utf-8, отсортированы побайтово), блок значений
+
+Рядом лежит индекс ударений (wordforms.stress1.idx) в том же формате:
+для каждой словоформы — уже вычисленный результат
+stress.derive_single_accentuation, закодированный encode_stress.
+"""
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"RPWF1" + (b"L" if sys.byteorder == "little" else b"B") + b"\0\0"
+_HEADER = struct.Struct("=8sQQQ")
+
+
+def user_cache_dir() -> Path:
+    """Каталог пользовательского кэша ruphonetic (XDG_CACHE_HOME или ~/.cache)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return Path(base) / "ruphonetic"
+
+
+def _source_stamp(source: Path) -> Tuple[int, int]:
+    stat = source.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_table(items: Iterable[Tuple[str, bytes]], target: Path, stamp: Tuple[int, int] = (0, 0)) -> None:
+    """
+    Записывает таблицу {строка: bytes} в формате индекса.
+    Файл пишется во временный и атомарно подменяется через os.replace,
+    поэтому параллельно работающие процессы не увидят недописанный индекс.
+    """
+    encoded = sorted((key.encode("utf-8"), value) for key, value in items)
+    key_offsets = array("Q", [0])
+    value_offsets = array("Q", [0])
+    for key, value in encoded:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=target.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(encoded), stamp[0], stamp[1]))
+            key_offsets.tofile(f)
+            value_offsets.tofile(f)
+            for key, _ in encoded:
+                f.write(key)
+            for _, value in encoded:
+                f.write(value)
+        os.replace(tmp_name, target)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+class StringTable:
+    """
+    Отображение str -> значение поверх отсортированной таблицы в mmap.
+    Поддерживает `in`, `[]`, `get` и `len`, так что подставляется
+    вместо обычного dict там, где словарь только читается.
+    """
+
+    def __init__(self, path: Path, decode: Callable[[bytes], Any] = bytes):
+        self.path = Path(path)
+        self._decode = decode
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._size, size, mtime_ns = _HEADER.unpack_from(self._mm, 0)
+        self.stamp = (size, mtime_ns)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path}: неизвестный формат индекса")
+        offsets_start = _HEADER.size
+        offsets_len = (self._size + 1) * 8
+        self._view = view = memoryview(self._mm)
+        self._key_offsets = view[offsets_start:offsets_start + offsets_len].cast("Q")
+        values_start = offsets_start + offsets_len
+        self._value_offsets = view[values_start:values_start + offsets_len].cast("Q")
+        self._keys_base = values_start + offsets_len
+        self._values_base = self._keys_base + self._key_offsets[self._size]
+
+    def _find(self, key: str) -> int:
+        target = key.encode("utf-8")
+        key_offsets, mm, base = self._key_offsets, self._mm, self._keys_base
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = mm[base + key_offsets[mid]:base + key_offsets[mid + 1]]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _value(self, i: int) -> Any:
+        start = self._values_base + self._value_offsets[i]
+        end = self._values_base + self._value_offsets[i + 1]
+        return self._decode(self._mm[start:end])
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __getitem__(self, key: str) -> Any:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._value(i)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._find(key)
+        return self._value(i) if i >= 0 else default
+
+    def __len__(self) -> int:
+        return self._size
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Пары (строка, значение) в порядке таблицы."""
+        base, key_offsets = self._keys_base, self._key_offsets
+        for i in range(self._size):
+            key = self._mm[base + key_offsets[i]:base + key_offsets[i + 1]].decode("utf-8")
+            yield key, self._value(i)
+
+    def close(self) -> None:
+        """Освобождает отображение файла. После вызова таблица недоступна."""
+        self._key_offsets.release()
+        self._value_offsets.release()
+        self._view.release()
+        self._mm.close()
+
+
+def _decode_interpretations(raw: bytes) -> Any:
+    return json.loads(raw)
+
+
+def build_index(source: Path, target: Path) -> None:
+    """Перекладывает pickle-словарь wordforms.dat в индекс для mmap."""
+    with open(source, mode="rb") as f:
+        wordforms = pickle.loads(f.read())
+    items = (
+        (key, json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        for key, value in wordforms.items()
+    )
+    write_table(items, target, _source_stamp(source))
+
+
+def _is_fresh(target: Path, source: Path) -> bool:
+    if not target.exists():
+        return False
+    if not source.exists():
+        # Исходник могли не поставлять вместе с готовым индексом
+        return True
+    with open(target, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return False
+    magic, _, size, mtime_ns = _HEADER.unpack(header)
+    return magic == MAGIC and (size, mtime_ns) == _source_stamp(source)
+
+
+def index_path(source: Path) -> Path:
+    """
+    Путь к индексу для данного wordforms.dat: рядом с исходником,
+    а если каталог пакета недоступен для записи — в пользовательском кэше.
+    """
+    local = source.with_suffix(".idx")
+    if _is_fresh(local, source) or os.access(source.parent, os.W_OK):
+        return local
+    return user_cache_dir() / local.name
+
+
+def open_index(source: Path, target: Optional[Path] = None) -> StringTable:
+    """Открывает индекс словоформ, при необходимости (пере)собирая его."""
+    target = target or index_path(source)
+    if not _is_fresh(target, source):
+        build_index(source, target)
+    return StringTable(target, decode=_decode_interpretations)
+
+
+# Индекс ударений зависит от правил derive_single_accentuation:
+# при их изменении номер версии в имени файла нужно увеличить
+STRESS_INDEX_NAME = "wordforms.stress1.idx"
+
+# Значение в индексе ударений: AMBIGUOUS — словарь не даёт однозначного
+# ударения; FULL_FORM и форма в utf-8 — словарная форма отличается от
+# ключа не только знаками ударения; иначе — позиции знаков ` в ключе,
+# по байту на позицию (в том числе ни одной)
+AMBIGUOUS = b"\xff"
+FULL_FORM = b"\xfe"
+_MAX_POSITION = 0xfd
+
+
+def encode_stress(form: str, accentuated: Optional[str]) -> bytes:
+    """Кодирует ударение словоформы form для индекса ударений."""
+    if accentuated is None:
+        return AMBIGUOUS
+    positions: List[int] = []
+    length = 0
+    for char in accentuated:
+        if char == "`":
+            positions.append(length)
+        else:
+            length += 1
+    if len(form) <= _MAX_POSITION and accentuated.replace("`", "") == form:
+        return bytes(positions)
+    return FULL_FORM + accentuated.encode("utf-8")
+
+
+def decode_stress(form: str, raw: bytes) -> Optional[str]:
+    """Ударение словоформы form по значению из индекса ударений."""
+    if not raw:
+        return form
+    if raw == AMBIGUOUS:
+        return None
+    if raw[0] == FULL_FORM[0]:
+        return raw[1:].decode("utf-8")
+    if len(raw) == 1:
+        position = raw[0]
+        return form[:position] + "`" + form[position:]
+    parts = []
+    start = 0
+    for position in raw:
+        parts.append(form[start:position])
+        start = position
+    parts.append(form[start:])
+    return "`".join(parts)
+
+
+class StressTable(StringTable):
+    """
+    Индекс ударений: словоформа -> готовое ударение (None, если словарь
+    не даёт однозначного). get(form, default) возвращает default только
+    для словоформ, которых нет в словаре.
+    """
+
+    def __getitem__(self, form: str) -> Optional[str]:
+        return decode_stress(form, super().__getitem__(form))
+
+    def get(self, form: str, default: Any = None) -> Any:
+        i = self._find(form)
+        return decode_stress(form, self._value(i)) if i >= 0 else default
+
+    def items(self) -> Iterator[Tuple[str, Optional[str]]]:
+        for form, raw in super().items():
+            yield form, decode_stress(form, raw)
+
+
+def build_stress_index(
+    wordforms: StringTable,
+    derive: Callable[[Any], Optional[str]],
+    target: Path
+) -> None:
+    """
+    Записывает индекс ударений: для каждой словоформы wordforms —
+    derive(интерпретации). Штамп индекса — штамп таблицы словоформ.
+    """
+    items = ((form, encode_stress(form, derive(interpretations))) for form, interpretations in wordforms.items())
+    write_table(items, target, wordforms.stamp)
+
+
+def _stamp_of(target: Path) -> Optional[Tuple[int, int]]:
+    if not target.exists():
+        return None
+    with open(target, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    magic, _, size, mtime_ns = _HEADER.unpack(header)
+    return (size, mtime_ns) if magic == MAGIC else None
+
+
+def stress_index_path(wordforms: StringTable) -> Path:
+    """Путь к индексу ударений: рядом с индексом словоформ или в пользовательском кэше."""
+    local = wordforms.path.with_name(STRESS_INDEX_NAME)
+    if _stamp_of(local) == wordforms.stamp or os.access(local.parent, os.W_OK):
+        return local
+    return user_cache_dir() / local.name
+
+
+def open_stress_index(
+    wordforms: StringTable,
+    derive: Callable[[Any], Optional[str]],
+    target: Optional[Path] = None
+) -> StressTable:
+    """Открывает индекс ударений, (пере)собирая его, если он старше таблицы словоформ."""
+    target = target or stress_index_path(wordforms)
+    if _stamp_of(target) != wordforms.stamp:
+        build_stress_index(wordforms, derive, target)
+    return StressTable(target)
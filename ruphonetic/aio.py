@@ -0,0 +1,216 @@
+"""
+Асинхронные варианты функций для асинхронных сервисов: atranscribe,
+asound_spectre, asound_spectre_grouped, aidentify_author_by_sound_spectre.
+
+Вычисления уходят в общий пул процессов (по умолчанию — свой
+ProcessPoolExecutor, процессы которого получают настройки вызывающего
+процесса и один раз выполняют ruphonetic.warmup), так что цикл событий
+не блокируется. Свой пул пересоздаётся, когда меняются настройки
+(parallel.worker_settings) или падает процесс пула: запросы, которые
+выполнялись в упавшем пуле, получают BrokenProcessPool, следующие уходят
+в новый пул. Одновременно в пуле не больше
+max_concurrency задач, остальные ждут своей очереди в цикле событий;
+если ждущих больше max_waiting, новые запросы сразу получают Overloaded.
+
+Одинаковые запросы, пришедшие, пока такой же ещё считается, не ставятся
+в пул повторно, а ждут общего результата. Отмена ожидающей корутины
+снимает задачу, только если её больше никто не ждёт: задача, ещё не
+начатая в пуле, отменяется, а уже начатая досчитывается, но её результат
+отбрасывается.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import ruphonetic
+from ruphonetic import parallel
+
+
+class Overloaded(RuntimeError):
+    """Очередь ожидания переполнена (см. configure(max_waiting=...))."""
+
+
+_executor: Optional[Executor] = None
+_own_executor = False
+# Настройки, с которыми создан свой пул
+_executor_settings: Optional[parallel.WorkerSettings] = None
+_max_concurrency: Optional[int] = None
+_max_waiting: Optional[int] = None
+_settings_lock = threading.Lock()
+
+
+class _LoopState:
+    """Очередь и выполняющиеся запросы одного цикла событий."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Задачи в очереди и в пуле (одинаковые запросы — одна задача)
+        self.active = 0
+        # ключ запроса -> [задача, число ожидающих её корутин]
+        self.inflight: Dict[Tuple[Any, ...], List[Any]] = {}
+
+
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+
+def configure(
+    executor: Optional[Executor] = None,
+    max_concurrency: Optional[int] = None,
+    max_waiting: Optional[int] = None
+) -> None:
+    """
+    Настраивает асинхронный API. Вызывать до первых запросов
+    (уже выполняющиеся запросы досчитываются со старыми настройками).
+    :param executor: пул для вычислений (по умолчанию — пул процессов
+        по числу ядер); пул, переданный сюда, закрывает вызывающий
+    :param max_concurrency: сколько задач одновременно держать в пуле
+        (по умолчанию — по числу ядер)
+    :param max_waiting: сколько запросов может ждать очереди, прежде чем
+        новые получат Overloaded (по умолчанию — без ограничения)
+    """
+    global _executor, _own_executor, _max_concurrency, _max_waiting
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError("max_concurrency должен быть положительным")
+    if max_waiting is not None and max_waiting < 0:
+        raise ValueError("max_waiting не может быть отрицательным")
+    with _settings_lock:
+        if executor is not None:
+            if _own_executor:
+                _executor.shutdown(wait=False)
+            _executor, _own_executor = executor, False
+        _max_concurrency = max_concurrency
+        _max_waiting = max_waiting
+        _states.clear()
+
+
+def shutdown() -> None:
+    """Закрывает пул, созданный асинхронным API (следующий запрос создаст новый)."""
+    global _executor, _own_executor
+    with _settings_lock:
+        if _own_executor:
+            _executor.shutdown()
+        _executor, _own_executor = None, False
+        _states.clear()
+
+
+def _get_executor() -> Executor:
+    global _executor, _own_executor, _executor_settings
+    settings = parallel.worker_settings()
+    with _settings_lock:
+        # _broken — признак ProcessPoolExecutor, что процесс пула упал
+        if _own_executor and (settings != _executor_settings or getattr(_executor, "_broken", False)):
+            # Уже отправленные задачи досчитываются в прежнем пуле
+            _executor.shutdown(wait=False)
+            _executor, _own_executor = None, False
+        if _executor is None:
+            # Процессы пула получают настройки этого процесса (см. parallel.worker_settings)
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=parallel.init_worker,
+                                            initargs=(settings,))
+            _own_executor, _executor_settings = True, settings
+        return _executor
+
+
+def _discard_executor(executor: Executor) -> None:
+    """Закрывает свой пул, если он сломан: следующий запрос создаст новый."""
+    global _executor, _own_executor
+    with _settings_lock:
+        if _own_executor and _executor is executor:
+            executor.shutdown(wait=False)
+            _executor, _own_executor = None, False
+
+
+def _get_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState(_max_concurrency or os.cpu_count() or 1)
+    return state
+
+
+def _call(name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Выполняется в пуле: вызов функции ruphonetic по имени."""
+    return getattr(ruphonetic, name)(*args, **kwargs)
+
+
+async def _run(state: _LoopState, name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    async with state.semaphore:
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        try:
+            return await loop.run_in_executor(executor, _call, name, args, kwargs)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            raise
+
+
+async def _submit(name: str, *args: Any, **kwargs: Any) -> Any:
+    """Ставит вызов в пул или присоединяется к такому же выполняющемуся."""
+    state = _get_state()
+    key = (name, args, tuple(sorted(kwargs.items())))
+    entry = state.inflight.get(key)
+    if entry is None:
+        waiting = state.active - state.max_concurrency
+        if _max_waiting is not None and waiting >= _max_waiting:
+            raise Overloaded(f"В очереди уже {waiting} запросов")
+        state.active += 1
+        task = asyncio.ensure_future(_run(state, name, args, kwargs))
+        entry = state.inflight[key] = [task, 0]
+
+        def forget(_: Any, entry: List[Any] = entry) -> None:
+            # Вызывается и для задачи, отменённой до старта
+            state.active -= 1
+            if state.inflight.get(key) is entry:
+                del state.inflight[key]
+
+        task.add_done_callback(forget)
+    task = entry[0]
+    entry[1] += 1
+    try:
+        result = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if entry[1] == 1 and not task.done():
+            # Больше никто не ждёт: снимаем задачу с очереди и из пула.
+            # Ключ убираем сразу, а не в forget: такой же запрос, пришедший
+            # до обратного вызова, иначе присоединился бы к отменённой задаче
+            if state.inflight.get(key) is entry:
+                del state.inflight[key]
+            task.cancel()
+        raise
+    finally:
+        entry[1] -= 1
+    # Ожидающие одного запроса получают собственные копии словарей
+    return dict(result) if isinstance(result, dict) else result
+
+
+async def atranscribe(text: str, simplify: bool = False, engine: str = "regex") -> str:
+    """Асинхронный transcribe."""
+    return await _submit("transcribe", text, simplify=simplify, engine=engine)
+
+
+async def asound_spectre(text: str, input_is_transcribed: bool = False, engine: str = "regex") -> Dict[str, float]:
+    """Асинхронный sound_spectre (без графиков)."""
+    return await _submit("sound_spectre", text, input_is_transcribed=input_is_transcribed, engine=engine)
+
+
+async def asound_spectre_grouped(
+    text: str,
+    input_is_transcribed: bool = False,
+    engine: str = "regex"
+) -> Dict[str, float]:
+    """Асинхронный sound_spectre_grouped (без графиков)."""
+    return await _submit("sound_spectre_grouped", text, input_is_transcribed=input_is_transcribed, engine=engine)
+
+
+async def aidentify_author_by_sound_spectre(
+    text: str,
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None
+) -> Dict[str, float]:
+    """Асинхронный identify_author_by_sound_spectre."""
+    return await _submit("identify_author_by_sound_spectre", text, grouped=grouped, engine=engine, top_k=top_k)
@@ -0,0 +1,209 @@
+"""
+Сборка спектров авторов (authors/*/sound_spectres/*.json) из корпусов
+authors/*/examples/*.txt.
+
+Корпуса читаются потоком и режутся на фрагменты (transcriptor.stream_sources),
+фрагменты всех пересобираемых авторов транскрибируются параллельно в пуле
+процессов, а счётчики фонем складываются по авторам. Оба варианта спектра
+пишутся атомарно, рядом сохраняется manifest.json с хэшами исходников и
+движком транскрипции: автор пересобирается, только если его корпус или
+движок изменились.
+
+Запуск из командной строки:
+    python -m ruphonetic.author_builder [автор ...] [--jobs N] [--force]
+"""
+import argparse
+import codecs
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import ruphonetic
+from ruphonetic import parallel, transcriptor
+from ruphonetic.author_index import AUTHORS_DIR, SPECTRE_FILES, reload_author_index
+from ruphonetic.phonemes import N_PHONEMES, PhonemeSequence, spectre_from_counts
+
+MANIFEST_FILE = "manifest.json"
+# Фрагменты мельче, чем у transcribe_stream, чтобы корпус одного автора
+# тоже раскладывался по всем процессам
+BUILD_CHUNK_SIZE = 20000
+_READ_BLOCK = 1 << 20
+
+
+def _read_source(path: Path) -> Tuple[str, str]:
+    """SHA-256 файла и его кодировка: utf-8, если файл в ней корректен, иначе cp1251."""
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    encoding = "utf-8"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            digest.update(block)
+            if encoding == "utf-8":
+                try:
+                    decoder.decode(block)
+                except UnicodeDecodeError:
+                    encoding = "cp1251"
+    if encoding == "utf-8":
+        try:
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            encoding = "cp1251"
+    return digest.hexdigest(), encoding
+
+
+def _write_json(path: Path, data: dict) -> None:
+    """Атомарная запись JSON: во временный файл и os.replace."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def _read_manifest(spectres_dir: Path) -> dict:
+    try:
+        with open(spectres_dir / MANIFEST_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def _is_built(spectres_dir: Path, sources: Dict[str, str], engine: str) -> bool:
+    """Спектры на месте и собраны из тех же исходников тем же движком."""
+    manifest = _read_manifest(spectres_dir)
+    if manifest.get("sources") != sources or manifest.get("engine") != engine:
+        return False
+    for name in SPECTRE_FILES.values():
+        try:
+            with open(spectres_dir / name, encoding="utf-8") as f:
+                json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return False
+    return True
+
+
+def _count_source(source: str, after_newline: bool, engine: str) -> np.ndarray:
+    """Счётчики фонем упрощённой транскрипции фрагмента (выполняется в пуле)."""
+    transcription = transcriptor.transcribe_source(source, after_newline, simplify=True, engine=engine)
+    return PhonemeSequence.from_transcription(transcription).counts()
+
+
+def _author_sources(files: Sequence[Tuple[Path, str]], chunk_size: int) -> Iterator[Tuple[str, bool]]:
+    for path, encoding in files:
+        with open(path, encoding=encoding) as f:
+            yield from transcriptor.stream_sources(f, chunk_size)
+
+
+def _count_parallel(
+    executor: Executor,
+    jobs: Dict[str, Iterator[Tuple[str, bool]]],
+    engine: str,
+    max_pending: int
+) -> Dict[str, np.ndarray]:
+    """
+    Раздаёт фрагменты всех авторов пулу, держа в очереди не больше
+    max_pending задач, чтобы большие корпуса не читались в память целиком.
+    """
+    counts = {author: np.zeros(N_PHONEMES, dtype=np.int64) for author in jobs}
+    queue = ((author, source) for author, sources in jobs.items() for source in sources)
+    pending = {}
+    for author, (source, after_newline) in queue:
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                counts[pending.pop(future)] += future.result()
+        pending[executor.submit(_count_source, source, after_newline, engine)] = author
+    for future in wait(pending).done:
+        counts[pending[future]] += future.result()
+    return counts
+
+
+def build_author_spectres(
+    authors: Optional[Sequence[str]] = None,
+    authors_dir: Path = AUTHORS_DIR,
+    jobs: Optional[int] = None,
+    force: bool = False,
+    chunk_size: int = BUILD_CHUNK_SIZE,
+    engine: str = "fast"
+) -> Dict[str, str]:
+    """
+    Собирает sound_spectre.json и sound_spectre_grouped.json авторов
+    из их корпусов examples/*.txt.
+    :param authors: имена каталогов авторов (по умолчанию — все с корпусами)
+    :param jobs: число процессов (по умолчанию — по числу ядер), 1 — без пула
+    :param force: пересобрать, даже если корпус и движок не менялись
+    :param engine: движок транскрипции, см. transcribe
+    :return: {автор: "built" | "up-to-date"}
+    """
+    authors_dir = Path(authors_dir)
+    if authors is None:
+        authors = sorted(path.parent.name for path in authors_dir.glob("*/examples"))
+    status: Dict[str, str] = {}
+    todo: Dict[str, List[Tuple[Path, str]]] = {}
+    hashes: Dict[str, Dict[str, str]] = {}
+    for author in authors:
+        files = sorted((authors_dir / author / "examples").glob("*.txt"))
+        if not files:
+            raise FileNotFoundError(f"Нет корпуса для автора {author}: {authors_dir / author / 'examples'}")
+        read = [_read_source(path) for path in files]
+        hashes[author] = {path.name: digest for path, (digest, _) in zip(files, read)}
+        if not force and _is_built(authors_dir / author / "sound_spectres", hashes[author], engine):
+            status[author] = "up-to-date"
+        else:
+            todo[author] = [(path, encoding) for path, (_, encoding) in zip(files, read)]
+    if not todo:
+        return status
+
+    sources = {author: _author_sources(files, chunk_size) for author, files in todo.items()}
+    jobs = parallel.resolve_jobs(jobs)
+    if jobs == 1:
+        counts = {
+            author: sum((_count_source(source, after_newline, engine) for source, after_newline in author_sources),
+                        np.zeros(N_PHONEMES, dtype=np.int64))
+            for author, author_sources in sources.items()
+        }
+    else:
+        # Общий пул: процессы получают режим ударений и настройки кэшей
+        # этого процесса (parallel.init_worker) при любом способе запуска
+        with parallel.borrow_pool(jobs) as executor:
+            counts = _count_parallel(executor, sources, engine, max_pending=parallel.PENDING_PER_WORKER * jobs)
+
+    for author, author_counts in counts.items():
+        spectres_dir = authors_dir / author / "sound_spectres"
+        spectres_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(spectres_dir / SPECTRE_FILES[False], spectre_from_counts(author_counts))
+        _write_json(spectres_dir / SPECTRE_FILES[True], ruphonetic._grouped_spectre(author_counts))
+        # Манифест пишется последним: прерванная сборка повторится целиком
+        _write_json(spectres_dir / MANIFEST_FILE, {"sources": hashes[author], "engine": engine})
+        status[author] = "built"
+    reload_author_index()
+    return status
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m ruphonetic.author_builder",
+        description="Собирает спектры авторов из корпусов authors/*/examples/*.txt"
+    )
+    parser.add_argument("authors", nargs="*", help="имена авторов (по умолчанию — все)")
+    parser.add_argument("--authors-dir", type=Path, default=AUTHORS_DIR, help="каталог авторов")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="число процессов")
+    parser.add_argument("--force", action="store_true", help="пересобрать все указанные спектры")
+    args = parser.parse_args(argv)
+    status = build_author_spectres(args.authors or None, args.authors_dir, jobs=args.jobs, force=args.force)
+    for author, state in status.items():
+        print(f"{author}: {state}")
+
+
+if __name__ == "__main__":
+    main()
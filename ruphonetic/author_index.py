@@ -0,0 +1,139 @@
+"""
+Индекс спектров авторов для identify_author_by_sound_spectre.
+
+Спектры авторов (authors/*/sound_spectres/*.json) читаются с диска один раз
+на процесс и хранятся как матрица numpy «авторы × звуки» с нормированными
+строками (L2). Косинусное сходство текста со всеми авторами — одно
+умножение матрицы на вектор, пакета текстов — одно умножение матриц.
+"""
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ruphonetic.phonemes import PHONEMES
+
+AUTHORS_DIR = Path(__file__).parent / "authors"
+SPECTRE_FILES = {False: "sound_spectre.json", True: "sound_spectre_grouped.json"}
+
+
+class AuthorIndex:
+    """
+    Нормированные спектры авторов: matrix[i] — спектр authors[i]
+    по оси звуков axis, длина каждой строки равна 1 (или 0 для пустого спектра).
+    """
+
+    def __init__(self, authors: List[str], axis: List[str], matrix: np.ndarray):
+        self.authors = authors
+        self.axis = axis
+        self.matrix = matrix
+        self._positions = {sound: i for i, sound in enumerate(axis)}
+
+    @classmethod
+    def from_spectres(cls, spectres: Dict[str, Dict[str, float]], axis: Optional[Sequence[str]] = None) -> "AuthorIndex":
+        """
+        Строит индекс из словаря {автор: спектр}. Ось по умолчанию — все
+        звуки, встречающиеся в спектрах, в порядке первого появления.
+        """
+        if axis is None:
+            axis = list(dict.fromkeys(sound for spectre in spectres.values() for sound in spectre))
+        axis = list(axis)
+        positions = {sound: i for i, sound in enumerate(axis)}
+        matrix = np.zeros((len(spectres), len(axis)))
+        for row, spectre in zip(matrix, spectres.values()):
+            for sound, value in spectre.items():
+                if sound not in positions:
+                    raise ValueError(f"Звук {sound} не входит в ось индекса")
+                row[positions[sound]] = value
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return cls(list(spectres), axis, matrix)
+
+    @classmethod
+    def load(cls, grouped: bool = False, authors_dir: Path = AUTHORS_DIR) -> "AuthorIndex":
+        """
+        Читает спектры авторов из authors_dir/*/sound_spectres/.
+        Файлы, которые не удалось прочитать или разобрать, пропускаются.
+        """
+        spectres: Dict[str, Dict[str, float]] = {}
+        for spectre_file in sorted(Path(authors_dir).glob(f"*/sound_spectres/{SPECTRE_FILES[grouped]}")):
+            try:
+                with open(spectre_file, 'r', encoding='utf-8') as f:
+                    spectres[spectre_file.parent.parent.name] = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                continue
+        # У обычного спектра ось фиксирована — все фонемы транскрипции
+        axis = None
+        if not grouped:
+            axis = list(PHONEMES)
+            axis += [sound for spectre in spectres.values() for sound in spectre if sound not in PHONEMES]
+            axis = list(dict.fromkeys(axis))
+        return cls.from_spectres(spectres, axis)
+
+    def __len__(self) -> int:
+        return len(self.authors)
+
+    def vectorize(self, spectres: Iterable[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Матрица спектров по оси индекса и их полные нормы: звуки вне оси
+        в скалярное произведение не входят, но учитываются в норме.
+        """
+        spectres = list(spectres)
+        vectors = np.zeros((len(spectres), len(self.axis)))
+        norms = np.zeros(len(spectres))
+        positions = self._positions
+        for i, spectre in enumerate(spectres):
+            for sound, value in spectre.items():
+                position = positions.get(sound)
+                if position is not None:
+                    vectors[i, position] = value
+            norms[i] = math.sqrt(sum(value * value for value in spectre.values()))
+        return vectors, norms
+
+    def scores(self, vectors: np.ndarray, norms: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Косинусное сходство векторов (по оси индекса) со всеми авторами:
+        для вектора — массив по авторам, для матрицы — «тексты × авторы».
+        """
+        vectors = np.asarray(vectors, dtype=float)
+        if norms is None:
+            norms = np.linalg.norm(vectors, axis=-1)
+        products = vectors @ self.matrix.T
+        norms = np.asarray(norms)[..., np.newaxis]
+        return np.divide(products, norms, out=np.zeros(products.shape), where=norms > 0)
+
+    def rank(self, scores: np.ndarray, top_k: Optional[int] = None) -> Dict[str, float]:
+        """Словарь {автор: сходство} по убыванию сходства, не больше top_k авторов."""
+        order = np.argsort(-scores, kind="stable")
+        if top_k is not None:
+            order = order[:top_k]
+        return {self.authors[i]: float(scores[i]) for i in order}
+
+    def identify(self, spectres: Iterable[Dict[str, float]], top_k: Optional[int] = None) -> List[Dict[str, float]]:
+        """Ранжирует авторов для каждого спектра пакета одним умножением матриц."""
+        vectors, norms = self.vectorize(spectres)
+        return [self.rank(row, top_k) for row in self.scores(vectors, norms)]
+
+
+_indexes: Dict[bool, AuthorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_author_index(grouped: bool = False) -> AuthorIndex:
+    """Индекс спектров авторов, загружаемый с диска один раз на процесс."""
+    index = _indexes.get(grouped)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(grouped)
+            if index is None:
+                index = _indexes[grouped] = AuthorIndex.load(grouped)
+    return index
+
+
+def reload_author_index() -> None:
+    """Сбрасывает загруженные индексы: следующий вызов перечитает спектры с диска."""
+    with _indexes_lock:
+        _indexes.clear()
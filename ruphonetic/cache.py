@@ -0,0 +1,129 @@
+"""
+Кэш транскрипций словоформ для быстрого движка (engine="fast").
+
+Стихи сильно повторяются на уровне словоформ, поэтому транскрипция слова
+после расстановки ударений запоминается между вызовами transcribe() и
+функций спектра. Ключ — словоформа с ударениями: внутрисловным правилам
+другого контекста не нужно. Слова на краях текста зависят от его начала
+и конца, для них ключ — кортеж (словоформа, at_start, has_next, at_eos).
+Значение — транскрипция слова до межсловных правил и удаления ъ, одна и та
+же для обычной и упрощённой транскрипции.
+
+Кэшем пользуется только engine="fast". Классический движок ("regex") —
+эталонная цепочка проходов re.sub по всему тексту, с которой сверяется
+быстрый движок. Он не делит текст на слова, и разбиение на слова для
+кэша превратило бы его в тот же быстрый движок: результат у них одинаков,
+поэтому для повторяющихся запросов достаточно выбрать engine="fast".
+Ударения не кэшируются: в режиме "spacy" ударение слова зависит от тега,
+то есть от контекста предложения.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+# Политики вытеснения: "lru" — давно не использованные, "fifo" — самые старые
+POLICIES = ("lru", "fifo")
+DEFAULT_CAPACITY = 200000
+
+
+class WordCache:
+    """
+    Ограниченный по числу записей потокобезопасный кэш с подсчётом
+    попаданий, промахов и вытеснений. capacity=0 отключает кэш.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, policy: str = "lru"):
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self.capacity = 0
+        self.policy = "lru"
+        self.configure(capacity, policy)
+
+    def configure(self, capacity: Optional[int] = None, policy: Optional[str] = None) -> None:
+        """Меняет ёмкость и/или политику вытеснения, лишние записи вытесняются сразу."""
+        if policy is not None and policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика вытеснения: {policy}. Доступны: {', '.join(POLICIES)}")
+        if capacity is not None and capacity < 0:
+            raise ValueError("Ёмкость кэша не может быть отрицательной")
+        with self._lock:
+            if capacity is not None:
+                self.capacity = capacity
+            if policy is not None:
+                self.policy = policy
+            self._evict()
+
+    def _evict(self) -> None:
+        extra = len(self._data) - self.capacity
+        if extra > 0:
+            for _ in range(extra):
+                self._data.popitem(last=False)
+            self.evictions += extra
+
+    def lookup(self, keys: Iterable[Hashable]) -> Dict[Hashable, str]:
+        """Возвращает найденные в кэше записи для keys, остальные считаются промахами."""
+        found: Dict[Hashable, str] = {}
+        requested = 0
+        with self._lock:
+            data = self._data
+            lru = self.policy == "lru"
+            for key in keys:
+                requested += 1
+                value = data.get(key)
+                if value is not None:
+                    found[key] = value
+                    if lru:
+                        data.move_to_end(key)
+            self.hits += len(found)
+            self.misses += requested - len(found)
+        return found
+
+    def store(self, items: Dict[Hashable, str]) -> None:
+        """Добавляет записи, при переполнении вытесняя старые по политике кэша."""
+        if not self.capacity:
+            return
+        with self._lock:
+            data = self._data
+            if self.policy == "lru":
+                # update не переносит уже имеющиеся ключи в конец: без этого
+                # только что использованная запись вытеснялась бы первой
+                for key, value in items.items():
+                    data[key] = value
+                    data.move_to_end(key)
+            else:
+                data.update(items)
+            self._evict()
+
+    def clear(self) -> None:
+        """Очищает кэш и обнуляет статистику."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика: попадания, промахи, доля попаданий, вытеснения, размер."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "capacity": self.capacity,
+                "policy": self.policy,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _reset_lock(self) -> None:
+        self._lock = threading.Lock()
+
+
+# Общий кэш процесса, им пользуется transcribe(..., engine="fast")
+word_cache = WordCache()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=word_cache._reset_lock)
@@ -0,0 +1,205 @@
+"""
+Командная строка ruphonetic.
+
+    ruphonetic transcribe [файл ...] [--simplify] [--lines] [--jobs N]
+    ruphonetic spectre [файл ...] [--lines] [--jobs N]
+    ruphonetic grouped [файл ...] [--lines] [--jobs N]
+    ruphonetic identify [файл ...] [--grouped] [--top-k K] [--early-stop] [--lines] [--jobs N]
+
+Без файлов (или с файлом "-") читается stdin. Файлы читаются потоком,
+результаты пишутся в stdout по мере готовности: транскрипция — текстом,
+спектры и авторы — строками JSON (JSONL), по одной на файл, а с --lines —
+на каждую строку входа. --jobs N раздаёт работу пулу процессов
+(ruphonetic.parallel): транскрипцию файла — по фрагментам, спектры — по
+файлам, а с --lines — по пачкам строк. identify --early-stop читает файл,
+пока рейтинг авторов не устоится (ruphonetic.identify_author_streaming),
+и добавляет к записи chars_read и complete. --accentuation, --disk-cache
+и --word-cache действуют и в процессах пула.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import ruphonetic
+from ruphonetic import parallel, transcriptor
+from ruphonetic.accentuation import stress
+from ruphonetic.transcriptor import ENGINES, STREAM_CHUNK_SIZE
+
+# Строк в одной пачке для пула в режиме --lines
+LINES_PER_BATCH = 64
+
+
+def _open(path: str, encoding: str) -> TextIO:
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding=encoding)
+    return open(path, encoding=encoding)
+
+
+def _compute(text: Any, options: Dict[str, Any]) -> Any:
+    """Результат команды для текста (строки или потока)."""
+    command, engine = options["command"], options["engine"]
+    if command == "transcribe":
+        return ruphonetic.transcribe(text, simplify=options["simplify"], engine=engine)
+    if command == "spectre":
+        return ruphonetic.sound_spectre(text, engine=engine)
+    if command == "grouped":
+        return ruphonetic.sound_spectre_grouped(text, engine=engine)
+    if options["early_stop"]:
+        result = ruphonetic.identify_author_streaming(
+            text, grouped=options["grouped"], engine=engine, top_k=options["top_k"], tolerance=options["tolerance"]
+        )
+        return {"authors": result.scores, "chars_read": result.chars_read, "complete": result.complete}
+    return ruphonetic.identify_author_by_sound_spectre(
+        text, grouped=options["grouped"], engine=engine, top_k=options["top_k"]
+    )
+
+
+def _compute_lines(batch: List[Tuple[str, int, str]], options: Dict[str, Any]) -> List[Tuple[str, int, Any]]:
+    return [(source, number, _compute(line, options)) for source, number, line in batch]
+
+
+def _compute_files(batch: List[str], options: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    results = []
+    for path in batch:
+        with _open(path, options["encoding"]) as f:
+            results.append((path, _compute(f, options)))
+    return results
+
+
+def _transcribe_sources(batch: List[Tuple[str, bool]], options: Dict[str, Any]) -> List[str]:
+    return [
+        transcriptor.transcribe_source(source, after_newline, simplify=options["simplify"], engine=options["engine"])
+        for source, after_newline in batch
+    ]
+
+
+def _read_lines(paths: Sequence[str], encoding: str) -> Iterator[Tuple[str, int, str]]:
+    for path in paths:
+        with _open(path, encoding) as f:
+            for number, line in enumerate(f, 1):
+                yield path, number, line.rstrip("\n")
+
+
+def _record(options: Dict[str, Any], source: str, result: Any, line: Optional[int] = None) -> str:
+    record: Dict[str, Any] = {"source": source}
+    if line is not None:
+        record["line"] = line
+    if options["early_stop"]:
+        record.update(result)
+        return json.dumps(record, ensure_ascii=False)
+    field = {"transcribe": "transcription", "identify": "authors"}.get(options["command"], "spectre")
+    record[field] = result
+    return json.dumps(record, ensure_ascii=False)
+
+
+def run(options: Dict[str, Any], paths: Sequence[str], out: TextIO) -> None:
+    jobs = options["jobs"]
+    jsonl = options["format"] == "jsonl"
+    if options["lines"]:
+        results = parallel.run_batches(
+            _compute_lines, _read_lines(paths, options["encoding"]), (options,),
+            jobs, LINES_PER_BATCH, ordered=True
+        )
+        for source, number, result in results:
+            if jsonl:
+                out.write(_record(options, source, result, number) + "\n")
+            else:
+                out.write(result.replace("\n", " ") + "\n")
+            out.flush()
+        return
+
+    if options["command"] == "transcribe":
+        for path in paths:
+            with _open(path, options["encoding"]) as f:
+                sources = transcriptor.stream_sources(f, options["chunk_size"])
+                chunks = transcriptor.join_transcribed(
+                    parallel.run_batches(_transcribe_sources, sources, (options,), jobs, 1, ordered=True)
+                )
+                if jsonl:
+                    out.write(_record(options, path, "".join(chunks)) + "\n")
+                else:
+                    chunk = ""
+                    for chunk in chunks:
+                        out.write(chunk)
+                        out.flush()
+                    if not chunk.endswith("\n"):
+                        out.write("\n")
+            out.flush()
+        return
+
+    if "-" in paths:
+        # stdin нельзя передать в другой процесс
+        jobs = 1
+    for source, result in parallel.run_batches(_compute_files, paths, (options,), jobs, 1, ordered=True):
+        out.write(_record(options, source, result) + "\n")
+        out.flush()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="ruphonetic", description="Фонетический анализ русского текста")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("files", nargs="*", default=["-"], help="входные файлы (по умолчанию и «-» — stdin)")
+    common.add_argument("--lines", action="store_true", help="обрабатывать каждую строку как отдельный текст")
+    common.add_argument("--jobs", "-j", type=int, default=1, help="число процессов (0 — по числу ядер)")
+    common.add_argument("--engine", choices=ENGINES, default="fast", help="движок транскрипции")
+    common.add_argument("--encoding", default="utf-8", help="кодировка входных файлов")
+    common.add_argument("--accentuation", choices=stress.MODES, default="spacy",
+                        help="режим расстановки ударений, см. configure_accentuation")
+    common.add_argument("--disk-cache", nargs="?", const="", default=None, metavar="PATH",
+                        help="постоянный кэш результатов (без PATH — в пользовательском кэше), см. enable_disk_cache")
+    common.add_argument("--word-cache", type=int, default=None, metavar="N",
+                        help="ёмкость кэша словоформ быстрого движка, 0 — отключить")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    transcribe = commands.add_parser("transcribe", parents=[common], help="транскрипция")
+    transcribe.add_argument("--simplify", action="store_true", help="упрощённая транскрипция")
+    transcribe.add_argument("--format", choices=("text", "jsonl"), default="text", help="формат вывода")
+    transcribe.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE,
+                            help="примерный размер фрагмента файла в символах")
+    commands.add_parser("spectre", parents=[common], help="спектр звуков (JSONL)")
+    commands.add_parser("grouped", parents=[common], help="групповой спектр (JSONL)")
+    identify = commands.add_parser("identify", parents=[common], help="сходство с авторами (JSONL)")
+    identify.add_argument("--grouped", action="store_true", help="сравнивать групповые спектры")
+    identify.add_argument("--top-k", type=int, default=None, help="сколько авторов выводить")
+    identify.add_argument("--early-stop", action="store_true",
+                          help="читать текст, пока рейтинг не устоится (identify_author_streaming)")
+    identify.add_argument("--tolerance", type=float, default=0.1,
+                          help="допустимое относительное изменение отрыва лидера для --early-stop")
+
+    args = parser.parse_args(argv)
+    options = {
+        "command": args.command,
+        "engine": args.engine,
+        "encoding": args.encoding,
+        "lines": args.lines,
+        "jobs": args.jobs or None,
+        "format": getattr(args, "format", "jsonl"),
+        "simplify": getattr(args, "simplify", False),
+        "chunk_size": getattr(args, "chunk_size", STREAM_CHUNK_SIZE),
+        "grouped": getattr(args, "grouped", False),
+        "top_k": getattr(args, "top_k", None),
+        "early_stop": getattr(args, "early_stop", False),
+        "tolerance": getattr(args, "tolerance", 0.1),
+    }
+    # Настройки процесса; процессы пула получают их через инициализатор
+    # (parallel.worker_settings), так что они действуют и при spawn
+    ruphonetic.configure_accentuation(args.accentuation)
+    if args.disk_cache is not None:
+        ruphonetic.enable_disk_cache(args.disk_cache or None)
+    if args.word_cache is not None:
+        ruphonetic.configure_word_cache(capacity=args.word_cache)
+    try:
+        run(options, args.files, sys.stdout)
+    except BrokenPipeError:
+        # Вывод закрыли (например, | head): выходим молча, не давая
+        # интерпретатору снова споткнуться о закрытый stdout при выходе
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
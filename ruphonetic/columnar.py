@@ -0,0 +1,357 @@
+"""
+Столбцовое хранилище спектров для анализа корпусов.
+
+Спектры тысяч и миллионов текстов хранятся не словарями и не JSON, а
+каталогом массивов numpy, которые открываются через mmap без копирования:
+
+    index.json — вид спектров (kind), ось столбцов (фонемы или группы),
+        число документов и окон, параметры; пишется последним
+    values.npy — float32: документы × столбцы, а для окон —
+        все окна всех документов подряд × столбцы
+    ids.bin, id_offsets.npy — идентификаторы документов (utf-8 подряд)
+        и их границы (int64, документы + 1)
+    row_offsets.npy — только для окон: строки values документа i —
+        row_offsets[i]:row_offsets[i + 1]
+    window_offsets.npy — только для окон: границы [начало, конец)
+        каждого окна в транскрипции (int64, окна × 2)
+
+ColumnarWriter пишет хранилище пачками, не держа его в памяти;
+export_spectres считает спектры текстов в общем пуле процессов
+и сразу пишет их; open_spectres открывает хранилище.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import ruphonetic
+from ruphonetic import parallel
+from ruphonetic.phonemes import PHONEMES
+
+FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+KINDS = ("sound_spectre", "sound_spectre_grouped", "windows")
+
+
+def _write_npy(path: Path, raw_path: Path, dtype: np.dtype, shape: Tuple[int, ...]) -> None:
+    """
+    Превращает сырой файл значений в .npy: заголовок и содержимое подряд.
+    Файл пишется рядом и переименовывается, как index.json.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.lib.format.write_array_header_2_0(
+            f, {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape}
+        )
+        with open(raw_path, "rb") as raw:
+            shutil.copyfileobj(raw, f, 1 << 20)
+    os.replace(tmp_path, path)
+    os.remove(raw_path)
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    """np.save через временный файл и переименование."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class ColumnarWriter:
+    """
+    Пишет хранилище в каталог path пачками: add() для каждого документа
+    (или add_many() для матрицы документов), затем close(). До close()
+    каталог не содержит index.json, и open_spectres его не откроет.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        columns: Sequence[str],
+        kind: str = "sound_spectre",
+        params: Optional[Dict[str, Any]] = None
+    ):
+        if kind not in KINDS:
+            raise ValueError(f"Неизвестный вид спектров: {kind}. Доступны: {', '.join(KINDS)}")
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.kind = kind
+        self.params = dict(params or {})
+        # Параметры попадут в index.json: ошибка сериализации — до записи, а не после
+        json.dumps(self.params)
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Прежнее хранилище в этом каталоге перестаёт быть действительным сразу
+        (self.path / INDEX_FILE).unlink(missing_ok=True)
+        self._values = open(self.path / "values.raw", "wb")
+        self._ids = open(self.path / "ids.bin", "wb")
+        self._id_offsets = [0]
+        self._rows = 0
+        self._windows = None
+        self._row_offsets = [0]
+        if kind == "windows":
+            self._windows = open(self.path / "window_offsets.raw", "wb")
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+    def __len__(self) -> int:
+        return len(self._id_offsets) - 1
+
+    def _add_id(self, doc_id: str) -> None:
+        encoded = str(doc_id).encode("utf-8")
+        self._ids.write(encoded)
+        self._id_offsets.append(self._id_offsets[-1] + len(encoded))
+
+    def add(self, doc_id: str, values: np.ndarray, offsets: Optional[np.ndarray] = None) -> None:
+        """
+        Добавляет документ: вектор по столбцам, а для окон — матрицу
+        «окна × столбцы» и границы окон offsets («окна × 2»).
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if self._windows is not None:
+            values = values.reshape(-1, len(self.columns))
+            offsets = np.asarray(offsets, dtype=np.int64).reshape(len(values), 2)
+            self._windows.write(offsets.tobytes())
+            self._row_offsets.append(self._row_offsets[-1] + len(values))
+        elif values.shape != (len(self.columns),):
+            raise ValueError(f"Ожидался вектор из {len(self.columns)} значений, получено {values.shape}")
+        self._values.write(values.tobytes())
+        self._rows += len(values) if values.ndim == 2 else 1
+        self._add_id(doc_id)
+
+    def add_many(self, doc_ids: Sequence[str], values: np.ndarray) -> None:
+        """Добавляет пачку документов матрицей «документы × столбцы» (не для окон)."""
+        if self._windows is not None:
+            raise ValueError("Окна добавляются по документу: add(doc_id, values, offsets)")
+        values = np.asarray(values, dtype=np.float32).reshape(len(doc_ids), len(self.columns))
+        self._values.write(values.tobytes())
+        self._rows += len(values)
+        for doc_id in doc_ids:
+            self._add_id(doc_id)
+
+    def close(self) -> None:
+        """Дописывает массивы и index.json."""
+        for f in (self._values, self._ids, self._windows):
+            if f is not None:
+                f.close()
+        _write_npy(self.path / "values.npy", self.path / "values.raw", np.float32, (self._rows, len(self.columns)))
+        _save_npy(self.path / "id_offsets.npy", np.array(self._id_offsets, dtype=np.int64))
+        if self._windows is not None:
+            _write_npy(self.path / "window_offsets.npy", self.path / "window_offsets.raw", np.int64, (self._rows, 2))
+            _save_npy(self.path / "row_offsets.npy", np.array(self._row_offsets, dtype=np.int64))
+        index = {
+            "format": FORMAT_VERSION,
+            "kind": self.kind,
+            "columns": self.columns,
+            "documents": len(self),
+            "rows": self._rows,
+            "params": self.params,
+        }
+        tmp_path = self.path / (INDEX_FILE + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, self.path / INDEX_FILE)
+
+    def _abort(self) -> None:
+        for f in (self._values, self._ids, self._windows):
+            if f is not None:
+                f.close()
+        for name in ("values.raw", "window_offsets.raw"):
+            (self.path / name).unlink(missing_ok=True)
+
+
+class _Ids:
+    """Идентификаторы документов поверх ids.bin: декодируются по обращению."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data = bytes(self._data)
+        offsets = self._offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode("utf-8")
+
+    def index(self, doc_id: str) -> int:
+        """Номер документа по идентификатору (словарь строится при первом вызове)."""
+        if self._positions is None:
+            self._positions = {value: i for i, value in enumerate(self)}
+        return self._positions[doc_id]
+
+
+class SpectreTable:
+    """
+    Открытое хранилище: columns — ось столбцов, values — массив float32
+    в mmap, ids — идентификаторы документов. Документ задаётся номером
+    или идентификатором.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        try:
+            with open(self.path / INDEX_FILE, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"{self.path}: нет {INDEX_FILE} — хранилище не записано до конца") from None
+        if index.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: неизвестная версия формата {index.get('format')}")
+        self.kind: str = index["kind"]
+        self.columns: List[str] = index["columns"]
+        self.params: Dict[str, Any] = index["params"]
+        self.values = np.load(self.path / "values.npy", mmap_mode="r")
+        id_offsets = np.load(self.path / "id_offsets.npy", mmap_mode="r")
+        ids_path = self.path / "ids.bin"
+        ids_data = np.memmap(ids_path, dtype=np.uint8, mode="r") if ids_path.stat().st_size else np.zeros(0, np.uint8)
+        self.ids = _Ids(ids_data, id_offsets)
+        self.row_offsets = self.window_offsets = None
+        if self.kind == "windows":
+            self.row_offsets = np.load(self.path / "row_offsets.npy", mmap_mode="r")
+            self.window_offsets = np.load(self.path / "window_offsets.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _position(self, doc: Union[int, str]) -> int:
+        return self.ids.index(doc) if isinstance(doc, str) else int(doc)
+
+    def vector(self, doc: Union[int, str]) -> np.ndarray:
+        """Строка values документа (для окон — матрица «окна × столбцы»), без копирования."""
+        i = self._position(doc)
+        if self.row_offsets is None:
+            return self.values[i]
+        return self.values[self.row_offsets[i]:self.row_offsets[i + 1]]
+
+    def offsets(self, doc: Union[int, str]) -> np.ndarray:
+        """Границы окон документа в его транскрипции (только для окон)."""
+        if self.window_offsets is None:
+            raise ValueError("Границы окон есть только у хранилища окон")
+        i = self._position(doc)
+        return self.window_offsets[self.row_offsets[i]:self.row_offsets[i + 1]]
+
+    def spectre(self, doc: Union[int, str]) -> Dict[str, float]:
+        """
+        Спектр документа словарём, как у sound_spectre (ненулевые доли по
+        убыванию) или sound_spectre_grouped (все группы по порядку).
+        """
+        row = self.vector(doc)
+        if self.kind == "windows":
+            raise ValueError("Для окон используйте vector() и offsets()")
+        if self.kind == "sound_spectre_grouped":
+            return {column: float(value) for column, value in zip(self.columns, row)}
+        order = np.argsort(-row, kind="stable")
+        return {self.columns[j]: float(row[j]) for j in order if row[j] > 0}
+
+
+def open_spectres(path: Union[str, Path]) -> SpectreTable:
+    """Открывает хранилище, записанное ColumnarWriter или export_spectres."""
+    return SpectreTable(path)
+
+
+def columns_for(kind: str, groups: Optional[Mapping[str, Sequence[str]]] = None) -> List[str]:
+    """Ось столбцов для вида спектров: все фонемы или группы."""
+    if groups is not None:
+        from ruphonetic.groupings import compile_grouping
+        return compile_grouping(groups).names
+    if kind == "sound_spectre_grouped":
+        return list(ruphonetic.GROUP_PATTERNS)
+    return list(PHONEMES)
+
+
+def _spectre_batch(
+    batch: List[Tuple[str, str]],
+    kind: str,
+    engine: str,
+    window: Dict[str, Any]
+) -> List[Tuple[str, np.ndarray, Optional[np.ndarray]]]:
+    results = []
+    for doc_id, text in batch:
+        if kind == "windows":
+            windows = ruphonetic.sound_spectre_windows(text, engine=engine, **window)
+            results.append((doc_id, windows.spectres, windows.offsets))
+            continue
+        counts, _ = ruphonetic._phoneme_counts(text, False, engine)
+        if kind == "sound_spectre_grouped":
+            values = np.array(list(ruphonetic._grouped_spectre(counts).values()), dtype=np.float32)
+        else:
+            total = counts.sum()
+            values = (counts / total if total else counts).astype(np.float32)
+        results.append((doc_id, values, None))
+    return results
+
+
+def export_spectres(
+    path: Union[str, Path],
+    texts: Union[Mapping[str, str], Iterable[Tuple[str, str]]],
+    kind: str = "sound_spectre",
+    engine: str = "regex",
+    jobs: Optional[int] = None,
+    chunksize: int = 16,
+    window: Optional[Dict[str, Any]] = None
+) -> SpectreTable:
+    """
+    Считает спектры текстов в общем пуле процессов (см. parallel) и пишет
+    их в хранилище path по мере готовности.
+    :param texts: {идентификатор: текст} или пары (идентификатор, текст)
+    :param kind: "sound_spectre", "sound_spectre_grouped" или "windows"
+    :param window: для kind="windows" — параметры sound_spectre_windows
+        (size, unit, stride, grouped, groups); groups хранится в params
+        словарём {название: [звуки]}, даже если передан Grouping
+    :return: открытое хранилище
+    """
+    window = dict(window or {})
+    if window.get("groups") is not None:
+        from ruphonetic.groupings import compile_grouping
+        # В params (index.json) и в процессы пула идёт словарь {название: [звуки]}
+        window["groups"] = compile_grouping(window["groups"]).to_dict()
+    if kind == "windows" and "size" not in window:
+        raise ValueError("Для окон нужен window={'size': ..., 'unit': ...}")
+    if isinstance(texts, Mapping):
+        texts = texts.items()
+    if kind == "windows":
+        columns = columns_for("sound_spectre_grouped" if window.get("grouped") else kind, window.get("groups"))
+    else:
+        columns = columns_for(kind)
+    params = {"engine": engine, "window": window} if kind == "windows" else {"engine": engine}
+    with ColumnarWriter(path, columns, kind, params) as writer:
+        results = parallel.run_batches(_spectre_batch, texts, (kind, engine, window), jobs, chunksize, ordered=True)
+        for doc_id, values, offsets in results:
+            writer.add(doc_id, values, offsets)
+    return SpectreTable(path)
+
+
+def export_author_spectres(path: Union[str, Path], grouped: bool = False) -> SpectreTable:
+    """Спектры авторов (author_index) в хранилище: документ — автор."""
+    from ruphonetic.author_index import get_author_index
+    index = get_author_index(grouped)
+    kind = "sound_spectre_grouped" if grouped else "sound_spectre"
+    # Строки индекса нормированы по L2; в хранилище — доли, как в JSON авторов
+    totals = index.matrix.sum(axis=1, keepdims=True)
+    shares = np.divide(index.matrix, totals, out=np.zeros(index.matrix.shape), where=totals > 0)
+    with ColumnarWriter(path, index.axis, kind, {"source": "authors"}) as writer:
+        writer.add_many(index.authors, shares)
+    return SpectreTable(path)
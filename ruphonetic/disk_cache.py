@@ -0,0 +1,234 @@
+"""
+Постоянный кэш результатов на диске (SQLite) для повторных прогонов по
+одним и тем же корпусам.
+
+Кэш адресуется содержимым: ключ — SHA-256 от вида результата
+("transcription", "sound_spectre", ...), его параметров (simplify, режим
+ударений, движок), самого текста и отпечатка версии правил. Движки
+regex и fast должны давать одну и ту же транскрипцию, но движок всё же
+входит в ключ: расхождение в одном из них не попадёт в результаты другого. Отпечаток складывается из хэша
+исходников правил транскрипции, ударений и спектров, версии модели spaCy
+и размера и mtime словаря словоформ, поэтому изменение любого из них
+само делает старые записи недостижимыми, а вытеснение со временем их удаляет.
+
+Объём кэша ограничен (max_size в байтах), при превышении удаляются давно
+не читавшиеся записи (LRU). Кэш выключен по умолчанию и включается
+через ruphonetic.enable_disk_cache().
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ruphonetic.accentuation.wordforms import user_cache_dir
+
+DEFAULT_PATH = user_cache_dir() / "results.sqlite"
+DEFAULT_MAX_SIZE = 1 << 30  # 1 ГБ
+# После вытеснения кэш занимает не больше этой доли max_size,
+# чтобы не вытеснять на каждой записи
+_EVICT_TO = 0.9
+# Суммарный объём пересчитывается раз в столько записей
+_CHECK_EVERY = 64
+
+# Файлы, от которых зависят транскрипция (оба движка), ударения и спектры
+_RULES_SOURCES = (
+    "transcriptor.py",
+    "fast_transcriptor.py",
+    "accentuation/stress.py",
+    "accentuation/wordforms.py",
+    "phonemes.py",
+    "__init__.py",
+)
+_SPACY_MODEL = "ru_core_news_md"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+def rules_stamp() -> str:
+    """
+    Отпечаток версии правил: хэш исходников правил, версия модели spaCy
+    и размер и mtime словаря словоформ.
+    """
+    from ruphonetic.accentuation import stress
+    from ruphonetic.accentuation.wordforms import index_path
+    package = Path(__file__).parent
+    digest = hashlib.sha256()
+    for name in _RULES_SOURCES:
+        digest.update((package / name).read_bytes())
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+        digest.update(version(_SPACY_MODEL).encode())
+    except PackageNotFoundError:
+        digest.update(b"-")
+    source = stress.PATH / "wordforms.dat"
+    for path in (source, index_path(source)):
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+            break
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Кэш строковых результатов в базе SQLite. Соединение открывается
+    в каждом процессе заново, поэтому кэш можно использовать из пула
+    процессов; запись из нескольких процессов сериализует сама SQLite.
+    """
+
+    def __init__(self, path: Path = DEFAULT_PATH, max_size: int = DEFAULT_MAX_SIZE):
+        if max_size <= 0:
+            raise ValueError("Размер кэша должен быть положительным")
+        self.path = Path(path)
+        self.max_size = max_size
+        self.hits = self.misses = self.evictions = 0
+        self._stamp: Optional[str] = None
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            # После fork соединение родителя использовать нельзя
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def key(self, kind: str, text: str, **params: Any) -> str:
+        """Ключ записи: хэш вида результата, параметров, текста и версии правил."""
+        if self._stamp is None:
+            self._stamp = rules_stamp()
+        digest = hashlib.sha256()
+        digest.update(self._stamp.encode())
+        digest.update(json.dumps([kind, params], sort_keys=True).encode())
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0].decode("utf-8")
+
+    def put(self, key: str, value: str) -> None:
+        data = value.encode("utf-8")
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(key) + len(data), time.time()),
+            )
+            self._writes += 1
+            if self._writes % _CHECK_EVERY == 0 or len(data) > self.max_size * (1 - _EVICT_TO):
+                self._evict(connection)
+
+    def get_json(self, key: str) -> Any:
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def put_json(self, key: str, value: Any) -> None:
+        self.put(key, json.dumps(value, ensure_ascii=False))
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """Удаляет давно не читавшиеся записи, пока объём больше max_size."""
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size:
+            return
+        excess = total - int(self.max_size * _EVICT_TO)
+        removed = freed = 0
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute("SELECT key, size FROM entries ORDER BY accessed")
+            keys = []
+            for key, size in rows:
+                if freed >= excess:
+                    break
+                keys.append((key,))
+                freed += size
+            rows.close()
+            connection.executemany("DELETE FROM entries WHERE key = ?", keys)
+            removed = len(keys)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.evictions += removed
+
+    def clear(self) -> None:
+        """Удаляет все записи и обнуляет статистику."""
+        with self._lock:
+            self._connect().execute("DELETE FROM entries")
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "size": size,
+                "max_size": self.max_size,
+                "path": str(self.path),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+# Общий для процесса кэш; None — кэш выключен
+disk_cache: Optional[DiskCache] = None
+
+
+def enable(path: Optional[Path] = None, max_size: int = DEFAULT_MAX_SIZE) -> DiskCache:
+    global disk_cache
+    disable()
+    disk_cache = DiskCache(path or DEFAULT_PATH, max_size)
+    return disk_cache
+
+
+def disable() -> None:
+    global disk_cache
+    if disk_cache is not None:
+        disk_cache.close()
+    disk_cache = None
+
+
+def _reset_lock_after_fork() -> None:
+    if disk_cache is not None:
+        disk_cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_after_fork)
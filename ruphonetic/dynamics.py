@@ -0,0 +1,269 @@
+"""
+Динамика спектра по упрощённой транскрипции: скользящее окно по словам
+и нарастающие префиксы текста, а также окна по символам, словам,
+строкам и строфам с плотной матрицей float32 на выходе (spectre_windows).
+
+Текст один раз разбирается на слова и фонемы, дальше всё считается по
+накопленным суммам счётчиков фонем. Счётчики окна [i, i + w) — это
+разность двух строк накопленных сумм, то есть при сдвиге окна счётчики
+вошедшего слова прибавляются, а вышедшего — вычитаются, без повторного
+разбора текста. Счётчики префикса — сама накопленная сумма, и она
+хранится только в выбранных точках.
+
+numpy импортируется вместе с этим модулем, поэтому ruphonetic
+импортирует его только при первом вызове функций динамики.
+"""
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ruphonetic.phonemes import LETTERS, N_PHONEMES, PHONEME_IDS, PHONEMES, PhonemeSequence, spectre_from_counts
+
+WINDOW_UNITS = ("char", "word", "line", "stanza")
+_UNIT_PATTERNS = {"word": re.compile(r"[^ \n]+"), "line": re.compile(r"[^\n]+")}
+# Строфы разделяются пустыми (или состоящими из пробелов) строками
+STANZA_BREAK = re.compile(r"\n[ \t]*\n\s*")
+
+
+class WindowSpectres(NamedTuple):
+    """
+    Спектры окон: spectres[k, j] — доля фонемы phonemes[j] в окне,
+    которое начинается со слова starts[k]. substrings заполняются
+    только по запросу.
+    """
+    phonemes: List[str]
+    starts: np.ndarray
+    spectres: np.ndarray
+    substrings: Optional[List[str]] = None
+
+
+class LengthSpectres(NamedTuple):
+    """
+    Спектры префиксов: spectres[k, j] — доля фонемы phonemes[j] в первых
+    lengths[k] словах текста.
+    """
+    phonemes: List[str]
+    lengths: np.ndarray
+    spectres: np.ndarray
+
+
+def split_words(text: str) -> List[str]:
+    """Слова транскрипции в том же разбиении, что и раньше: по пробелам, \\n — тоже пробел."""
+    return text.replace("\n", " ").split(" ")
+
+
+def _phoneme_codes(text: str) -> Tuple[List[str], np.ndarray, np.ndarray, int]:
+    """
+    Разбирает транскрипцию: список встретившихся фонем (по убыванию частоты
+    во всём тексте), номер слова и номер фонемы в этом списке для каждого
+    вхождения, число слов.
+    """
+    sequence = PhonemeSequence.from_transcription(text)
+    counts = sequence.counts()
+    spectre = spectre_from_counts(counts, sequence.first_positions())
+    phonemes = list(spectre)
+    remap = np.zeros(N_PHONEMES, dtype=np.intp)
+    remap[[PHONEME_IDS[phoneme] for phoneme in phonemes]] = np.arange(len(phonemes))
+    return phonemes, sequence.word_index(), remap[sequence.codes], sequence.n_words
+
+
+def _grouped_counts(groups: np.ndarray, codes: np.ndarray, n_groups: int, n_phonemes: int) -> np.ndarray:
+    """Матрица счётчиков (группы × фонемы) по номеру группы каждого вхождения."""
+    flat = groups * n_phonemes + codes
+    return np.bincount(flat, minlength=n_groups * n_phonemes).reshape(n_groups, n_phonemes)
+
+
+def word_phoneme_counts(text: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Матрица счётчиков фонем по словам (слова × фонемы) и список фонем,
+    упорядоченный по убыванию частоты во всём тексте.
+    """
+    phonemes, word_index, codes, n_words = _phoneme_codes(text)
+    return phonemes, _grouped_counts(word_index, codes, n_words, len(phonemes))
+
+
+def _normalized(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+
+def window_spectres(text: str, word_amount: int, stride: int = 1, with_substrings: bool = False) -> WindowSpectres:
+    """
+    Спектры скользящего окна из word_amount слов с шагом stride по
+    упрощённой транскрипции text.
+    """
+    if stride < 1:
+        raise ValueError("Шаг окна должен быть положительным")
+    phonemes, counts = word_phoneme_counts(text)
+    n_words = counts.shape[0]
+    if word_amount > n_words:
+        raise IndexError("Количество слов в окне превышает общее число слов в тексте")
+
+    cumulative = np.zeros((n_words + 1, counts.shape[1]), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=cumulative[1:])
+    starts = np.arange(0, n_words - word_amount + 1, stride)
+    spectres = _normalized(cumulative[starts + word_amount] - cumulative[starts])
+
+    substrings = None
+    if with_substrings:
+        words = split_words(text)
+        substrings = [" ".join(words[i:i + word_amount]) for i in starts.tolist()]
+    return WindowSpectres(phonemes, starts, spectres, substrings)
+
+
+def prefix_lengths(n_words: int, step: int = 1, log_checkpoints: Optional[int] = None) -> np.ndarray:
+    """
+    Длины префиксов (в словах) от 1 до n_words - 1: каждые step слов или,
+    если задано log_checkpoints, столько точек, равномерно распределённых
+    в логарифмической шкале (совпавшие после округления точки схлопываются).
+    """
+    if step < 1:
+        raise ValueError("Шаг по длине должен быть положительным")
+    if n_words < 2:
+        return np.zeros(0, dtype=np.intp)
+    if log_checkpoints is None:
+        return np.arange(1, n_words, step)
+    if log_checkpoints < 1:
+        raise ValueError("Количество точек должно быть положительным")
+    points = np.geomspace(1, n_words - 1, num=log_checkpoints)
+    return np.unique(np.rint(points).astype(np.intp))
+
+
+def length_spectres(text: str, step: int = 1, log_checkpoints: Optional[int] = None) -> LengthSpectres:
+    """
+    Спектры нарастающих префиксов упрощённой транскрипции text в точках
+    prefix_lengths. Память — по числу точек, а не по числу слов.
+    """
+    phonemes, word_index, codes, n_words = _phoneme_codes(text)
+    lengths = prefix_lengths(n_words, step, log_checkpoints)
+    # Вхождение из слова i попадает во все префиксы длиннее i: считаем
+    # вхождения между соседними точками и накапливаем
+    segments = np.searchsorted(lengths, word_index, side="right")
+    counts = _grouped_counts(segments, codes, len(lengths) + 1, len(phonemes))
+    cumulative = np.cumsum(counts[:-1], axis=0)
+    return LengthSpectres(phonemes, lengths, _normalized(cumulative))
+
+
+def iter_length_spectres(
+    text: str,
+    step: int = 1,
+    log_checkpoints: Optional[int] = None
+) -> Iterator[Tuple[int, Dict[str, float]]]:
+    """
+    Ленивый вариант length_spectres: генератор пар (длина префикса, спектр),
+    где спектр — словарь как у sound_spectre. Между точками хранится
+    только вектор счётчиков фонем.
+    """
+    sequence = PhonemeSequence.from_transcription(text)
+    codes, offsets = sequence.codes, sequence.word_offsets
+    counts = np.zeros(N_PHONEMES, dtype=np.int64)
+    first = sequence.first_positions()
+    done = 0
+    for length in prefix_lengths(sequence.n_words, step, log_checkpoints).tolist():
+        end = offsets[length]
+        counts += np.bincount(codes[done:end], minlength=N_PHONEMES)
+        done = end
+        yield length, spectre_from_counts(counts, first)
+
+
+class SpectreWindows(NamedTuple):
+    """
+    Спектры окон: spectres[k, j] — доля столбца columns[j] (фонемы или
+    группы) в окне text[offsets[k, 0]:offsets[k, 1]].
+    """
+    columns: List[str]
+    offsets: np.ndarray
+    spectres: np.ndarray
+    text: str
+
+
+def split_stanzas(text: str) -> List[Tuple[int, int]]:
+    """Границы [начало, конец) непустых строф текста."""
+    spans = []
+    start = 0
+    for match in STANZA_BREAK.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+def unit_spans(text: str, unit: str) -> np.ndarray:
+    """Границы [начало, конец) непустых слов, строк или строф текста, матрица (единицы × 2)."""
+    if unit == "stanza":
+        spans = split_stanzas(text)
+    elif unit in _UNIT_PATTERNS:
+        spans = [match.span() for match in _UNIT_PATTERNS[unit].finditer(text)]
+    else:
+        raise ValueError(f"Неизвестная единица окна: {unit}. Доступны: {', '.join(WINDOW_UNITS)}")
+    return np.array(spans, dtype=np.int64).reshape(len(spans), 2)
+
+
+def window_offsets(text: str, unit: str, size: int, stride: int = 1) -> np.ndarray:
+    """
+    Границы [начало, конец) окон из size единиц (символов, слов, строк
+    или строф) с шагом stride единиц; матрица (окна × 2). Если единиц
+    меньше size, окон нет.
+    """
+    if size < 1 or stride < 1:
+        raise ValueError("Размер и шаг окна должны быть положительными")
+    if unit == "char":
+        starts = np.arange(0, len(text) - size + 1, stride, dtype=np.int64)
+        return np.stack([starts, starts + size], axis=1)
+    spans = unit_spans(text, unit)
+    first = np.arange(0, len(spans) - size + 1, stride)
+    return np.stack([spans[first, 0], spans[first + size - 1, 1]], axis=1).reshape(len(first), 2)
+
+
+def _phoneme_positions(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Номера фонем транскрипции (как в PhonemeSequence) и позиции их букв в text."""
+    codes = PhonemeSequence.from_transcription(text).codes
+    chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    positions = np.flatnonzero(chars - ord(LETTERS[0]) < len(LETTERS))
+    return codes, positions
+
+
+def window_counts(text: str, offsets: np.ndarray) -> np.ndarray:
+    """
+    Счётчики фонем (окна × N_PHONEMES) для окон text[начало:конец].
+    Накопленные суммы хранятся только в границах окон, поэтому память —
+    по числу окон, а не по длине текста.
+    """
+    codes, positions = _phoneme_positions(text)
+    # Граница окна в символах -> число фонем до неё
+    points, inverse = np.unique(np.searchsorted(positions, offsets.ravel()), return_inverse=True)
+    # Фонема с номером t попадает в префиксы всех границ больше t
+    segments = np.searchsorted(points, np.arange(len(codes)), side="right")
+    counts = np.bincount(segments * N_PHONEMES + codes, minlength=(len(points) + 1) * N_PHONEMES)
+    cumulative = np.cumsum(counts.reshape(len(points) + 1, N_PHONEMES)[:-1], axis=0)
+    at_bounds = cumulative[inverse.reshape(offsets.shape)]
+    return at_bounds[:, 1] - at_bounds[:, 0]
+
+
+def spectre_windows(
+    text: str,
+    size: int,
+    unit: str = "word",
+    stride: int = 1,
+    membership: Optional[np.ndarray] = None,
+    columns: Optional[List[str]] = None
+) -> SpectreWindows:
+    """
+    Спектры окон упрощённой транскрипции text по единицам unit
+    (WINDOW_UNITS). Без membership столбцы — все фонемы PHONEMES,
+    с матрицей принадлежности (группы × N_PHONEMES) — группы columns,
+    а доля группы — её вхождения, делённые на сумму вхождений всех групп.
+    Фонема относится к окну по позиции своей буквы: окно по символам,
+    отрезающее апостроф, всё равно считает согласную мягкой.
+    """
+    offsets = window_offsets(text, unit, size, stride)
+    counts = window_counts(text, offsets)
+    if membership is not None:
+        counts = counts @ membership.T
+    else:
+        columns = list(PHONEMES)
+    totals = counts.sum(axis=1, keepdims=True)
+    spectres = np.divide(counts, totals, out=np.zeros(counts.shape, dtype=np.float32), where=totals > 0,
+                         dtype=np.float32)
+    return SpectreWindows(list(columns), offsets, spectres, text)
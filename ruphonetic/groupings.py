@@ -0,0 +1,135 @@
+"""
+Пользовательские группировки фонем без консольного ввода.
+
+Группировка — словарь {название группы: [звуки]}, например
+{"губные": ["п", "б", "м"]}. Как и в sound_spectre_grouped_custom, звук
+ищется как подстрока транскрипции: буква без апострофа захватывает и мягкий
+вариант. Grouping компилирует группы один раз в матрицу принадлежности
+«группы × фонемы» (phonemes.sounds_membership) — таблицу, по которой
+число вхождений групп получается умножением на счётчики фонем. Поэтому
+текст разбирается один раз, а любое число группировок считается одним
+умножением матриц, сколько бы в них ни было звуков.
+
+Grouping сериализуется в JSON (to_dict/from_dict) и pickle, так что
+скомпилированную группировку можно сохранить и передать в другой процесс.
+"""
+import re
+from typing import Dict, List, Mapping, Sequence, Union
+
+import numpy as np
+
+from ruphonetic.phonemes import N_PHONEMES, sounds_membership
+
+_SOUND_RE = re.compile(r"[а-я]'?")
+
+
+class Grouping:
+    """
+    Скомпилированная группировка: groups — {название: [звуки]},
+    matrix — матрица принадлежности (группы × N_PHONEMES).
+    """
+    __slots__ = ("groups", "matrix")
+
+    def __init__(self, groups: Mapping[str, Sequence[str]]):
+        self.groups: Dict[str, List[str]] = {}
+        for name, sounds in groups.items():
+            if isinstance(sounds, str):
+                # Запись в стиле консольного ввода: "п|б|м"
+                sounds = sounds.split("|")
+            sounds = list(sounds)
+            for sound in sounds:
+                if not _SOUND_RE.fullmatch(sound):
+                    raise ValueError(f"Группа {name}: неверный звук {sound!r}, ожидается буква [а-я] и, возможно, '")
+            if len(set(sounds)) != len(sounds):
+                raise ValueError(f"Группа {name}: в группе не могут повторяться одни и те же звуки")
+            self.groups[str(name)] = sounds
+        if not self.groups:
+            raise ValueError("Группировка должна содержать хотя бы одну группу")
+        self.matrix = sounds_membership(self.groups.values())
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.groups)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __repr__(self) -> str:
+        return f"Grouping({self.groups!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Grouping) and self.groups == other.groups
+
+    def entries(self, counts: np.ndarray) -> np.ndarray:
+        """
+        Число вхождений групп по счётчикам фонем: для вектора — по группам,
+        для матрицы «тексты × N_PHONEMES» — «тексты × группы».
+        """
+        return np.asarray(counts) @ self.matrix.T
+
+    def spectre(self, counts: np.ndarray) -> Dict[str, float]:
+        """Доли групп, как у sound_spectre_grouped_custom (0 для текста без звуков групп)."""
+        return _shares(self.names, self.entries(counts))
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """Определение группировки для JSON; обратно — Grouping.from_dict."""
+        return {name: list(sounds) for name, sounds in self.groups.items()}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Sequence[str]]) -> "Grouping":
+        return cls(data)
+
+    def __getstate__(self) -> Dict[str, List[str]]:
+        return self.to_dict()
+
+    def __setstate__(self, state: Dict[str, List[str]]) -> None:
+        self.__init__(state)
+
+
+GroupingInput = Union[Grouping, Mapping[str, Sequence[str]]]
+
+
+def compile_grouping(groups: GroupingInput) -> Grouping:
+    """Grouping из словаря {название: [звуки]} (готовая Grouping возвращается как есть)."""
+    return groups if isinstance(groups, Grouping) else Grouping(groups)
+
+
+def _shares(names: List[str], entries: np.ndarray) -> Dict[str, float]:
+    total = int(entries.sum())
+    return {name: int(count) / total if total else 0.0 for name, count in zip(names, entries.tolist())}
+
+
+def evaluate_groupings(
+    counts: np.ndarray,
+    groupings: Mapping[str, GroupingInput]
+) -> List[Dict[str, Dict[str, float]]]:
+    """
+    Доли групп всех группировок для матрицы счётчиков фонем
+    (тексты × N_PHONEMES): матрицы принадлежности складываются в одну,
+    и все группы всех текстов считаются одним умножением.
+    :return: по тексту — {название группировки: {группа: доля}}
+    """
+    compiled = {name: compile_grouping(grouping) for name, grouping in groupings.items()}
+    counts = np.asarray(counts).reshape(-1, N_PHONEMES)
+    if not compiled:
+        return [{} for _ in counts]
+    stacked = np.vstack([grouping.matrix for grouping in compiled.values()])
+    entries = counts @ stacked.T
+    bounds = np.cumsum([0] + [len(grouping) for grouping in compiled.values()])
+    return [
+        {
+            name: _shares(grouping.names, row[start:end])
+            for (name, grouping), start, end in zip(compiled.items(), bounds[:-1], bounds[1:])
+        }
+        for row in entries
+    ]
+
+
+def load_groupings(data: Mapping[str, Mapping[str, Sequence[str]]]) -> Dict[str, Grouping]:
+    """Набор группировок из JSON-совместимого словаря {название: {группа: [звуки]}}."""
+    return {name: Grouping.from_dict(groups) for name, groups in data.items()}
+
+
+def dump_groupings(groupings: Mapping[str, Grouping]) -> Dict[str, Dict[str, List[str]]]:
+    """Обратное к load_groupings."""
+    return {name: grouping.to_dict() for name, grouping in groupings.items()}
@@ -0,0 +1,146 @@
+"""
+Профилирование стадий транскрипции.
+
+Каждая стадия конвейера (accentuate, word_ending, vowel_reduction, soften,
+apply_jotation, handle_sch_combinations, deafen_and_sharpen,
+remove_hard_sign, simplify_transcription, cleanup, у быстрого движка —
+fast_words и fast_assemble) при подключённых хуках сообщает о себе
+событием StageEvent: имя, время, размеры входа и выхода в символах и
+счётчики. Счётчики стадии accentuate — tokens_tagged (токенов через spaCy),
+dictionary_hits и dictionary_misses (слова, найденные и не найденные
+в словаре словоформ), ambiguous_unstressed (слова с гласными, оставшиеся
+без ударения из-за неоднозначного словаря); fast_words — word_cache_hits
+и word_cache_misses; disk_cache — hits и misses постоянного кэша.
+
+Хук — любой вызываемый объект, принимающий StageEvent (add_hook/remove_hook).
+Profiler — хук, накапливающий статистику по стадиям; profile() подключает
+его на время блока with:
+
+    with ruphonetic.instrumentation.profile() as profiler:
+        ruphonetic.transcribe(text)
+    print(profiler.report())
+
+Без хуков стадии вызываются напрямую, и профилирование ничего не стоит.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+
+class StageEvent(NamedTuple):
+    stage: str
+    seconds: float
+    input_size: int
+    output_size: int
+    counters: Dict[str, int]
+
+
+Hook = Callable[[StageEvent], None]
+
+# Список заменяется целиком, поэтому его можно читать без блокировки
+_hooks: List[Hook] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: Hook) -> None:
+    """Подключает хук: он будет вызываться после каждой стадии в любом потоке."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + [hook]
+
+
+def remove_hook(hook: Hook) -> None:
+    global _hooks
+    with _hooks_lock:
+        # Сравнение по ==: связанные методы при каждом обращении — новые объекты
+        _hooks = [h for h in _hooks if h != hook]
+
+
+def enabled() -> bool:
+    """Подключён ли хоть один хук."""
+    return bool(_hooks)
+
+
+def emit(stage: str, seconds: float, input_size: int, output_size: int,
+         counters: Optional[Dict[str, int]] = None) -> None:
+    """Передаёт событие стадии всем подключённым хукам."""
+    event = StageEvent(stage, seconds, input_size, output_size, dict(counters or {}))
+    for hook in _hooks:
+        hook(event)
+
+
+def run_stage(stage: str, function: Callable[..., str], value: str, counted: bool = False) -> str:
+    """
+    Вызывает стадию function(value) и, если подключены хуки, сообщает о ней.
+    counted=True — стадия принимает counters (collections.Counter) и
+    заполняет его; без хуков counters не передаётся.
+    """
+    if not _hooks:
+        return function(value)
+    counters: Counter = Counter()
+    start = time.perf_counter()
+    result = function(value, counters=counters) if counted else function(value)
+    emit(stage, time.perf_counter() - start, len(value), len(result), counters)
+    return result
+
+
+class Profiler:
+    """
+    Хук, накапливающий по стадиям число вызовов, суммарное время,
+    символы на входе и выходе и сумму счётчиков. Потокобезопасен.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def __call__(self, event: StageEvent) -> None:
+        with self._lock:
+            stats = self._stats.get(event.stage)
+            if stats is None:
+                stats = self._stats[event.stage] = {
+                    "calls": 0, "seconds": 0.0, "input_size": 0, "output_size": 0, "counters": Counter()
+                }
+            stats["calls"] += 1
+            stats["seconds"] += event.seconds
+            stats["input_size"] += event.input_size
+            stats["output_size"] += event.output_size
+            stats["counters"].update(event.counters)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        {стадия: {"calls", "seconds", "input_size", "output_size", "counters"}}
+        по убыванию суммарного времени.
+        """
+        with self._lock:
+            ordered = sorted(self._stats.items(), key=lambda item: -item[1]["seconds"])
+            return {stage: dict(stats, counters=dict(stats["counters"])) for stage, stats in ordered}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def report(self) -> str:
+        """Таблица стадий по убыванию времени с долей от общего времени."""
+        stats = self.stats()
+        total = sum(item["seconds"] for item in stats.values()) or 1.0
+        lines = [f"{'стадия':<26} {'вызовов':>8} {'сек':>10} {'доля':>7} {'символов/с':>12}  счётчики"]
+        for stage, item in stats.items():
+            rate = item["input_size"] / item["seconds"] if item["seconds"] else 0.0
+            counters = ", ".join(f"{name}={value}" for name, value in sorted(item["counters"].items()))
+            lines.append(f"{stage:<26} {item['calls']:>8} {item['seconds']:>10.4f} "
+                         f"{item['seconds'] / total:>7.1%} {rate:>12,.0f}  {counters}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile(profiler: Optional[Profiler] = None) -> Iterator[Profiler]:
+    """Подключает Profiler (новый или переданный) на время блока with."""
+    profiler = profiler if profiler is not None else Profiler()
+    add_hook(profiler)
+    try:
+        yield profiler
+    finally:
+        remove_hook(profiler)
@@ -0,0 +1,263 @@
+"""
+Пакетная обработка текстов в пуле процессов: transcribe_many, sound_spectre_many.
+
+Пул общий для всех вызовов и создаётся при первом обращении. Каждый
+процесс пула при старте получает настройки вызывающего процесса
+(WorkerSettings: режим ударений, постоянный кэш и кэш словоформ), поэтому
+они действуют при любом способе запуска процессов, не только при fork.
+Затем процесс один раз загружает модель spaCy и словарь словоформ
+(ruphonetic.warmup) и дальше переиспользует их, как и кэш словоформ
+быстрого движка.
+
+Живой пул один: вызов с другим числом процессов или после смены настроек
+создаёт новый пул, а прежний закрывается (shutdown(wait=False)), как
+только генераторы, ещё отправляющие в него пачки, закончат. Поэтому число
+процессов не растёт в долгоживущем сервисе, но вызовы с разным jobs
+вперемешку каждый раз пересоздают пул. Сломанный пул (процесс упал)
+тоже заменяется новым при следующем обращении.
+
+Тексты отправляются пачками по chunksize штук, в работе одновременно не
+больше нескольких пачек на процесс, поэтому входной поток может быть
+сколь угодно длинным, а результаты отдаются генератором.
+"""
+import atexit
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import ruphonetic
+from ruphonetic import disk_cache as _disk_cache
+from ruphonetic.accentuation import stress
+from ruphonetic.cache import word_cache
+
+# Сколько пачек на процесс держать в работе одновременно
+PENDING_PER_WORKER = 2
+
+class WorkerSettings(NamedTuple):
+    # Режим расстановки ударений (configure_accentuation)
+    accentuation: str
+    # (путь, max_size) постоянного кэша или None, если он выключен
+    disk_cache: Optional[Tuple[str, int]]
+    # Ёмкость и политика кэша словоформ (configure_word_cache)
+    word_cache_capacity: int
+    word_cache_policy: str
+
+
+def worker_settings() -> WorkerSettings:
+    """Настройки текущего процесса, которые передаются процессам пула."""
+    cache = _disk_cache.disk_cache
+    return WorkerSettings(
+        accentuation=stress.get_mode(),
+        disk_cache=(str(cache.path), cache.max_size) if cache is not None else None,
+        word_cache_capacity=word_cache.capacity,
+        word_cache_policy=word_cache.policy,
+    )
+
+
+def init_worker(settings: WorkerSettings) -> None:
+    """Инициализатор процесса пула: применяет настройки и вызывает ruphonetic.warmup."""
+    ruphonetic.configure_accentuation(settings.accentuation)
+    if settings.disk_cache is None:
+        ruphonetic.disable_disk_cache()
+    else:
+        ruphonetic.enable_disk_cache(*settings.disk_cache)
+    ruphonetic.configure_word_cache(settings.word_cache_capacity, settings.word_cache_policy)
+    ruphonetic.warmup()
+
+
+# Живой пул и его ключ (число процессов, настройки)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[Tuple[int, WorkerSettings]] = None
+# Сколько пользователей borrow_pool сейчас отправляют задачи в пул: прежний
+# пул закрывается, когда их не остаётся
+_pool_users: Dict[ProcessPoolExecutor, int] = {}
+_pool_lock = threading.Lock()
+
+
+def resolve_jobs(jobs: Optional[int] = None) -> int:
+    """Число процессов: jobs или, если не задано, число ядер."""
+    return jobs or os.cpu_count() or 1
+
+
+def _retire(pool: ProcessPoolExecutor) -> None:
+    """Закрывает прежний пул, если в него больше никто не отправляет задачи (под _pool_lock)."""
+    if not _pool_users.get(pool):
+        _pool_users.pop(pool, None)
+        # Уже отправленные задачи досчитываются, процессы завершаются после них
+        pool.shutdown(wait=False)
+
+
+def _current_pool(jobs: Optional[int]) -> ProcessPoolExecutor:
+    """Живой пул для jobs и текущих настроек, при необходимости новый (под _pool_lock)."""
+    global _pool, _pool_key
+    key = (resolve_jobs(jobs), worker_settings())
+    # _broken — признак ProcessPoolExecutor, что процесс пула упал
+    if _pool is None or _pool_key != key or getattr(_pool, "_broken", False):
+        if _pool is not None:
+            _retire(_pool)
+        workers, settings = key
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(settings,))
+        _pool_key = key
+    return _pool
+
+
+def get_pool(jobs: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Общий пул из jobs процессов (по умолчанию — по числу ядер)
+    с настройками текущего процесса (см. worker_settings). Пул может
+    закрыться при следующем обращении с другим jobs или настройками;
+    чтобы отправлять в него задачи долго, используйте borrow_pool.
+    """
+    with _pool_lock:
+        return _current_pool(jobs)
+
+
+@contextmanager
+def borrow_pool(jobs: Optional[int] = None) -> Iterator[ProcessPoolExecutor]:
+    """
+    Общий пул, как у get_pool, который не закроется, пока блок with
+    не завершится, даже если тем временем создан новый пул.
+    """
+    with _pool_lock:
+        pool = _current_pool(jobs)
+        _pool_users[pool] = _pool_users.get(pool, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[pool] -= 1
+            if pool is not _pool:
+                _retire(pool)
+            elif not _pool_users[pool]:
+                del _pool_users[pool]
+
+
+def shutdown_pool() -> None:
+    """Закрывает общий пул процессов (следующий вызов создаст новый)."""
+    global _pool, _pool_key
+    with _pool_lock:
+        pools = set(_pool_users)
+        if _pool is not None:
+            pools.add(_pool)
+        _pool, _pool_key = None, None
+        _pool_users.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+atexit.register(shutdown_pool)
+
+
+def _batches(texts: Iterable[Any], chunksize: int) -> Iterator[List[Any]]:
+    iterator = iter(texts)
+    while True:
+        batch = list(islice(iterator, chunksize))
+        if not batch:
+            return
+        yield batch
+
+
+def _transcribe_batch(texts: List[str], simplify: bool, engine: str) -> List[str]:
+    return [ruphonetic.transcribe(text, simplify=simplify, engine=engine) for text in texts]
+
+
+def _spectre_batch(texts: List[str], grouped: bool, engine: str) -> List[Dict[str, float]]:
+    spectre = ruphonetic.sound_spectre_grouped if grouped else ruphonetic.sound_spectre
+    return [spectre(text, engine=engine) for text in texts]
+
+
+def run_batches(
+    function: Callable[..., List[Any]],
+    texts: Iterable[Any],
+    args: Tuple[Any, ...],
+    jobs: Optional[int],
+    chunksize: int,
+    ordered: bool
+) -> Iterator[Any]:
+    """
+    Применяет function(пачка, *args) к пачкам по chunksize элементов texts
+    в общем пуле; function — функция уровня модуля, возвращающая список
+    результатов по элементам пачки. ordered=True — результаты в порядке
+    texts, иначе пары (номер элемента, результат) по мере готовности.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize должен быть положительным")
+    if jobs == 1:
+        # Без пула: удобно для отладки и для окружений без fork
+        index = 0
+        for batch in _batches(texts, chunksize):
+            for result in function(batch, *args):
+                yield result if ordered else (index, result)
+                index += 1
+        return
+
+    jobs = resolve_jobs(jobs)
+    max_pending = PENDING_PER_WORKER * jobs
+    pending: "deque[Tuple[int, Future]]" = deque()
+    start = 0
+
+    def collect() -> Iterator[Any]:
+        # В порядке входа ждём самую старую пачку, иначе — любую готовую
+        if ordered:
+            finished = [pending.popleft()]
+        else:
+            done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            finished = [item for item in pending if item[1] in done]
+            for item in finished:
+                pending.remove(item)
+        for first, future in finished:
+            for offset, result in enumerate(future.result()):
+                yield result if ordered else (first + offset, result)
+
+    with borrow_pool(jobs) as pool:
+        try:
+            for batch in _batches(texts, chunksize):
+                if len(pending) >= max_pending:
+                    yield from collect()
+                pending.append((start, pool.submit(function, batch, *args)))
+                start += len(batch)
+            while pending:
+                yield from collect()
+        finally:
+            # Генератор бросили на полпути: не держим очередь пула
+            for _, future in pending:
+                future.cancel()
+
+
+def transcribe_many(
+    texts: Iterable[str],
+    simplify: bool = False,
+    engine: str = "regex",
+    jobs: Optional[int] = None,
+    chunksize: int = 1,
+    ordered: bool = True
+) -> Iterator[Any]:
+    """
+    Транскрибирует тексты в пуле процессов.
+    :param texts: итерируемый набор текстов (может быть генератором)
+    :param jobs: число процессов (по умолчанию — по числу ядер), 1 — без пула
+    :param chunksize: сколько текстов отправлять процессу за раз
+        (для множества коротких текстов стоит увеличить)
+    :param ordered: True — генератор транскрипций в порядке texts,
+        False — пары (номер текста, транскрипция) по мере готовности
+    """
+    return run_batches(_transcribe_batch, texts, (simplify, engine), jobs, chunksize, ordered)
+
+
+def sound_spectre_many(
+    texts: Iterable[str],
+    grouped: bool = False,
+    engine: str = "regex",
+    jobs: Optional[int] = None,
+    chunksize: int = 1,
+    ordered: bool = True
+) -> Iterator[Any]:
+    """
+    Спектры текстов (sound_spectre или, при grouped=True,
+    sound_spectre_grouped) в пуле процессов. Параметры — как у transcribe_many.
+    """
+    return run_batches(_spectre_batch, texts, (grouped, engine), jobs, chunksize, ordered)
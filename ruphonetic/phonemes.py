@@ -0,0 +1,131 @@
+"""
+Упрощённая транскрипция как последовательность номеров фонем.
+
+Фонема — русская буква, возможно с апострофом мягкости, как в шаблоне
+[а-я]'? из sound_spectre. Набор фонем фиксирован (PHONEMES, 64 штуки),
+так что номер фонемы одинаков для всех текстов и помещается в uint8.
+Транскрипция разбирается один раз в PhonemeSequence, а спектры, группы
+и окна считаются по массиву номеров через bincount, без повторного
+прохода регулярными выражениями по строке.
+
+numpy импортируется вместе с этим модулем, поэтому ruphonetic
+импортирует его только при первом вызове функций спектра.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+LETTERS = "абвгдежзийклмнопрстуфхцчшщъыьэюя"  # [а-я]
+PHONEMES = tuple(letter + soft for letter in LETTERS for soft in ("", "'"))
+PHONEME_IDS = {phoneme: i for i, phoneme in enumerate(PHONEMES)}
+N_PHONEMES = len(PHONEMES)
+
+_FIRST_LETTER = ord(LETTERS[0])
+_APOSTROPHE = ord("'")
+_SPACE = ord(" ")
+_NEWLINE = ord("\n")
+
+
+class PhonemeSequence:
+    """
+    Фонемы транскрипции: codes — номера фонем (uint8, индексы в PHONEMES),
+    word_offsets — границы слов: слово k занимает codes[word_offsets[k]:word_offsets[k + 1]].
+    Слова разделяются пробелами и переводами строк, как в функциях динамики спектра.
+    """
+    __slots__ = ("codes", "word_offsets")
+
+    def __init__(self, codes: np.ndarray, word_offsets: np.ndarray):
+        self.codes = codes
+        self.word_offsets = word_offsets
+
+    @classmethod
+    def from_transcription(cls, text: str) -> "PhonemeSequence":
+        """Разбирает упрощённую транскрипцию (результат transcribe(..., simplify=True))."""
+        chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        letter_codes = chars - _FIRST_LETTER  # переполнение uint32 отсекает символы до «а»
+        is_letter = letter_codes < len(LETTERS)
+        soft = np.zeros(len(chars), dtype=bool)
+        soft[:-1] = chars[1:] == _APOSTROPHE
+        codes = (letter_codes[is_letter] * 2 + soft[is_letter]).astype(np.uint8)
+
+        # Граница слова — перед каждым пробелом или переводом строки
+        is_space = (chars == _SPACE) | (chars == _NEWLINE)
+        letters_before = np.cumsum(is_letter)
+        word_offsets = np.empty(int(is_space.sum()) + 2, dtype=np.intp)
+        word_offsets[0] = 0
+        word_offsets[1:-1] = letters_before[is_space]
+        word_offsets[-1] = len(codes)
+        return cls(codes, word_offsets)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_words(self) -> int:
+        return len(self.word_offsets) - 1
+
+    def __str__(self) -> str:
+        return " ".join(
+            "".join(PHONEMES[code] for code in self.codes[start:end])
+            for start, end in zip(self.word_offsets[:-1], self.word_offsets[1:])
+        )
+
+    def counts(self) -> np.ndarray:
+        """Счётчики фонем, вектор длины N_PHONEMES."""
+        return np.bincount(self.codes, minlength=N_PHONEMES)
+
+    def first_positions(self) -> np.ndarray:
+        """Позиция первого вхождения каждой фонемы (len(self) для отсутствующих)."""
+        positions = np.full(N_PHONEMES, len(self.codes), dtype=np.intp)
+        present, first = np.unique(self.codes, return_index=True)
+        positions[present] = first
+        return positions
+
+    def word_index(self) -> np.ndarray:
+        """Номер слова для каждой фонемы."""
+        return np.repeat(np.arange(self.n_words), np.diff(self.word_offsets))
+
+    def word_counts(self) -> np.ndarray:
+        """Матрица счётчиков фонем по словам (слова × N_PHONEMES)."""
+        flat = self.word_index() * N_PHONEMES + self.codes
+        return np.bincount(flat, minlength=self.n_words * N_PHONEMES).reshape(self.n_words, N_PHONEMES)
+
+
+def spectre_from_counts(counts: np.ndarray, first_positions: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """
+    Спектр {фонема: доля} по вектору счётчиков, отсортированный, как в
+    sound_spectre: по убыванию доли, при равенстве — по первому вхождению.
+    """
+    total = int(counts.sum())
+    if not total:
+        return {}
+    present = np.flatnonzero(counts)
+    if first_positions is None:
+        first_positions = np.arange(N_PHONEMES)
+    order = sorted(present.tolist(), key=lambda code: (-counts[code], first_positions[code]))
+    return {PHONEMES[code]: int(counts[code]) / total for code in order}
+
+
+def membership_matrix(patterns: Sequence[str]) -> np.ndarray:
+    """
+    Матрица принадлежности (группы × N_PHONEMES) для групп, заданных
+    регулярными выражениями над транскрипцией: элемент — сколько раз
+    шаблон группы находится в записи фонемы. Шаблоны вида буква + '?
+    не выходят за пределы фонемы, поэтому произведение матрицы на
+    счётчики фонем равно числу совпадений шаблона во всём тексте.
+    """
+    return np.array(
+        [[len(re.findall(pattern, phoneme)) for phoneme in PHONEMES] for pattern in patterns],
+        dtype=np.int64,
+    )
+
+
+def sounds_membership(groups: Iterable[List[str]]) -> np.ndarray:
+    """
+    Матрица принадлежности для групп, заданных списками звуков: звук без
+    апострофа включает и мягкий вариант, как при поиске подстроки в тексте,
+    и каждый звук группы считается отдельно.
+    """
+    rows = [membership_matrix([re.escape(sound) for sound in sounds]).sum(axis=0) for sounds in groups]
+    return np.array(rows, dtype=np.int64).reshape(len(rows), N_PHONEMES)
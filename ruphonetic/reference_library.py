@@ -0,0 +1,326 @@
+"""
+Библиотека эталонных спектров фрагментов для определения автора по
+ближайшим соседям (identify_author_by_neighbours).
+
+В отличие от AuthorIndex, где у автора один усреднённый спектр, здесь
+хранится спектр каждого фрагмента корпуса (примерно стихотворения):
+разброс внутри автора сохраняется, а авторов и фрагментов могут быть
+сотни тысяч. Текст сравнивается со всеми фрагментами, k самых похожих
+голосуют за своих авторов с весом, равным сходству.
+
+Формат каталога библиотеки:
+    library.json — авторы, оси спектров, параметры и отметка сборки build
+    vectors.<build>.npy, vectors_grouped.<build>.npy — float32,
+        фрагменты × ось, строки нормированы (L2); открываются через mmap
+    labels.<build>.npy — int32, номер автора (в library.json) для каждого
+        фрагмента
+Массивы новой сборки пишутся рядом со старыми под своей отметкой, а
+library.json подменяется последним, одной операцией. Прерванная сборка
+оставляет прежнюю библиотеку целой: её library.json ссылается только на
+массивы своей сборки.
+
+Каталог по умолчанию — reference_library_data рядом с пакетом, а если
+каталог пакета недоступен для записи — в пользовательском кэше
+(как индексы словоформ, см. accentuation.wordforms.index_path).
+
+Поиск — полный перебор блоками по BLOCK_ROWS строк: одно умножение
+float32-матрицы на вектор на блок и argpartition, так что памяти нужно
+на один блок, а время растёт линейно и для сотен тысяч фрагментов
+остаётся в пределах миллисекунд.
+
+Запуск из командной строки:
+    python -m ruphonetic.reference_library [автор ...] [--fragment-size N] [--jobs N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import ruphonetic
+from ruphonetic import parallel
+from ruphonetic.author_builder import _author_sources, _count_source, _read_source
+from ruphonetic.accentuation.wordforms import user_cache_dir
+from ruphonetic.author_index import AUTHORS_DIR
+from ruphonetic.phonemes import N_PHONEMES, PHONEMES
+
+PACKAGE_LIBRARY_DIR = Path(__file__).parent / "reference_library_data"
+LIBRARY_FILE = "library.json"
+# Имена массивов без отметки сборки и расширения, см. _array_path
+VECTOR_FILES = {False: "vectors", True: "vectors_grouped"}
+LABELS_FILE = "labels"
+
+# Фрагмент корпуса — примерно одно стихотворение
+FRAGMENT_SIZE = 2000
+# Фрагменты короче (хвосты файлов) дают слишком шумный спектр
+MIN_PHONEMES = 200
+DEFAULT_K = 25
+BLOCK_ROWS = 1 << 16
+
+
+def library_dir() -> Path:
+    """
+    Каталог библиотеки по умолчанию: рядом с пакетом, а если каталог
+    пакета недоступен для записи (и библиотека там не собрана) —
+    в пользовательском кэше.
+    """
+    if (PACKAGE_LIBRARY_DIR / LIBRARY_FILE).exists() or os.access(PACKAGE_LIBRARY_DIR.parent, os.W_OK):
+        return PACKAGE_LIBRARY_DIR
+    return user_cache_dir() / "reference_library_data"
+
+
+def _array_path(path: Path, name: str, build: str) -> Path:
+    return path / f"{name}.{build}.npy"
+
+
+def counts_to_vectors(counts: np.ndarray, grouped: bool = False) -> np.ndarray:
+    """
+    Нормированные (L2) векторы float32 для матрицы счётчиков фонем
+    (тексты × N_PHONEMES): по фонемам или, при grouped=True, по группам
+    sound_spectre_grouped. Косинусное сходство не зависит от масштаба,
+    поэтому доли спектра можно не вычислять.
+    """
+    counts = np.atleast_2d(counts)
+    if grouped:
+        vectors = np.array([list(ruphonetic._grouped_spectre(row).values()) for row in counts], dtype=np.float32)
+        vectors = vectors.reshape(len(counts), -1)
+    else:
+        vectors = counts.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _top_k(scores: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """k наибольших сходств в каждой строке (без упорядочивания) и их номера."""
+    indices = np.broadcast_to(indices, scores.shape)
+    if scores.shape[1] <= k:
+        return scores, indices
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, top, axis=1), np.take_along_axis(indices, top, axis=1)
+
+
+class ReferenceLibrary:
+    """
+    Спектры фрагментов: vectors[i] — нормированный спектр фрагмента автора
+    authors[labels[i]] по оси axis.
+    """
+
+    def __init__(self, vectors: np.ndarray, labels: np.ndarray, authors: List[str], axis: List[str]):
+        self.vectors = vectors
+        self.labels = labels
+        self.authors = authors
+        self.axis = axis
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None, grouped: bool = False) -> "ReferenceLibrary":
+        """
+        Открывает библиотеку из каталога path (по умолчанию — library_dir());
+        векторы и метки читаются через mmap.
+        """
+        path = Path(path) if path is not None else library_dir()
+        rebuild = "Соберите её: python -m ruphonetic.reference_library"
+        try:
+            with open(path / LIBRARY_FILE, encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Библиотека фрагментов не собрана: {path}. {rebuild}") from None
+        if "build" not in meta:
+            raise ValueError(f"Библиотека фрагментов {path} в старом формате. {rebuild}")
+        vectors = np.load(_array_path(path, VECTOR_FILES[grouped], meta["build"]), mmap_mode="r")
+        labels = np.load(_array_path(path, LABELS_FILE, meta["build"]), mmap_mode="r")
+        if len(vectors) != meta["fragments"] or len(labels) != meta["fragments"]:
+            raise ValueError(f"Библиотека фрагментов {path} повреждена. {rebuild}")
+        return cls(vectors, labels, meta["authors"], meta["axes"][str(grouped).lower()])
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def nearest(self, vectors: np.ndarray, k: int = DEFAULT_K) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k ближайших фрагментов по косинусному сходству для каждого из
+        нормированных векторов: (номера фрагментов, сходства), обе матрицы
+        «запросы × k» по убыванию сходства.
+        """
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        k = min(k, len(self))
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_indices = np.empty((len(queries), 0), dtype=np.intp)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = queries @ self.vectors[start:start + BLOCK_ROWS].T
+            block_scores, block_indices = _top_k(block, np.arange(start, start + block.shape[1]), k)
+            best_scores, best_indices = _top_k(
+                np.concatenate([best_scores, block_scores], axis=1),
+                np.concatenate([best_indices, block_indices], axis=1),
+                k,
+            )
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_indices, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def vote(self, indices: np.ndarray, scores: np.ndarray, top_k: Optional[int] = None) -> List[Dict[str, float]]:
+        """
+        Голосование соседей: доля суммарного сходства, набранная каждым
+        автором, по убыванию доли (авторы без голосов не выводятся).
+        """
+        results = []
+        for row_indices, row_scores in zip(indices, scores):
+            weights = np.bincount(
+                self.labels[row_indices], weights=np.maximum(row_scores, 0), minlength=len(self.authors)
+            )
+            total = weights.sum()
+            order = [i for i in np.argsort(-weights, kind="stable") if weights[i] > 0]
+            if top_k is not None:
+                order = order[:top_k]
+            results.append({self.authors[i]: float(weights[i] / total) for i in order})
+        return results
+
+    def identify(self, vectors: np.ndarray, k: int = DEFAULT_K, top_k: Optional[int] = None) -> List[Dict[str, float]]:
+        """Авторы по голосованию k ближайших фрагментов для каждого вектора пакета."""
+        indices, scores = self.nearest(vectors, k)
+        return self.vote(indices, scores, top_k)
+
+
+_libraries: Dict[bool, ReferenceLibrary] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_reference_library(grouped: bool = False) -> ReferenceLibrary:
+    """Библиотека фрагментов из library_dir(), открываемая один раз на процесс."""
+    library = _libraries.get(grouped)
+    if library is None:
+        with _libraries_lock:
+            library = _libraries.get(grouped)
+            if library is None:
+                library = _libraries[grouped] = ReferenceLibrary.load(library_dir(), grouped)
+    return library
+
+
+def reload_reference_library() -> None:
+    """Сбрасывает открытые библиотеки: следующий вызов откроет их заново."""
+    with _libraries_lock:
+        _libraries.clear()
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    """Атомарная запись .npy: во временный файл и os.replace."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def write_library(target: Path, authors: List[str], labels: np.ndarray, counts: np.ndarray, meta: dict) -> None:
+    """
+    Записывает библиотеку по меткам авторов и счётчикам фонем фрагментов.
+    Массивы пишутся под новой отметкой сборки, library.json подменяется
+    последним: до этого момента открывается прежняя библиотека целиком,
+    после — новая. Массивы прежних сборок затем удаляются.
+    """
+    target = Path(target)
+    target.mkdir(parents=True, exist_ok=True)
+    build = uuid.uuid4().hex[:12]
+    for grouped, name in VECTOR_FILES.items():
+        _save_npy(_array_path(target, name, build), counts_to_vectors(counts, grouped))
+    _save_npy(_array_path(target, LABELS_FILE, build), np.asarray(labels, dtype=np.int32))
+    group_axis = list(ruphonetic._grouped_spectre(np.zeros(N_PHONEMES, dtype=np.int64)))
+    meta = dict(meta, build=build, authors=authors, fragments=len(labels),
+                axes={"false": list(PHONEMES), "true": group_axis})
+    fd, tmp_name = tempfile.mkstemp(dir=target, prefix=LIBRARY_FILE, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_name, target / LIBRARY_FILE)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    current = {_array_path(target, name, build).name for name in (*VECTOR_FILES.values(), LABELS_FILE)}
+    for name in (*VECTOR_FILES.values(), LABELS_FILE):
+        for path in target.glob(f"{name}.*npy"):
+            if path.name not in current:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass  # Открыт через mmap в Windows — останется до следующей сборки
+
+
+def _count_batch(batch: List[Tuple[int, str, bool]], engine: str) -> List[Tuple[int, np.ndarray]]:
+    return [(author, _count_source(source, after_newline, engine)) for author, source, after_newline in batch]
+
+
+def _fragments(authors_dir: Path, authors: Sequence[str], fragment_size: int) -> Iterator[Tuple[int, str, bool]]:
+    for number, author in enumerate(authors):
+        files = sorted((authors_dir / author / "examples").glob("*.txt"))
+        files = [(path, _read_source(path)[1]) for path in files]
+        for source, after_newline in _author_sources(files, fragment_size):
+            yield number, source, after_newline
+
+
+def build_reference_library(
+    authors: Optional[Sequence[str]] = None,
+    authors_dir: Path = AUTHORS_DIR,
+    target: Optional[Path] = None,
+    fragment_size: int = FRAGMENT_SIZE,
+    min_phonemes: int = MIN_PHONEMES,
+    jobs: Optional[int] = None,
+    engine: str = "fast"
+) -> int:
+    """
+    Собирает библиотеку фрагментов из корпусов authors_dir/*/examples/*.txt:
+    корпуса режутся на фрагменты примерно по fragment_size символов по
+    границам строф и строк, фрагменты транскрибируются в общем пуле процессов.
+    :param authors: имена каталогов авторов (по умолчанию — все с корпусами)
+    :param target: каталог библиотеки (по умолчанию — library_dir())
+    :param min_phonemes: фрагменты с меньшим числом фонем отбрасываются
+    :param jobs: число процессов (по умолчанию — по числу ядер), 1 — без пула
+    :return: число фрагментов в библиотеке
+    """
+    authors_dir = Path(authors_dir)
+    target = Path(target) if target is not None else library_dir()
+    if authors is None:
+        authors = sorted(path.parent.name for path in authors_dir.glob("*/examples"))
+    authors = list(authors)
+    labels: List[int] = []
+    counts: List[np.ndarray] = []
+    fragments = _fragments(authors_dir, authors, fragment_size)
+    for author, fragment_counts in parallel.run_batches(_count_batch, fragments, (engine,), jobs, 16, ordered=True):
+        if fragment_counts.sum() >= min_phonemes:
+            labels.append(author)
+            counts.append(fragment_counts.astype(np.int32))
+    matrix = np.array(counts, dtype=np.int32).reshape(len(counts), N_PHONEMES)
+    write_library(target, authors, np.array(labels, dtype=np.int32), matrix,
+                  {"fragment_size": fragment_size, "min_phonemes": min_phonemes, "engine": engine})
+    if target == library_dir():
+        reload_reference_library()
+    return len(labels)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m ruphonetic.reference_library",
+        description="Собирает библиотеку спектров фрагментов из корпусов authors/*/examples/*.txt"
+    )
+    parser.add_argument("authors", nargs="*", help="имена авторов (по умолчанию — все)")
+    parser.add_argument("--authors-dir", type=Path, default=AUTHORS_DIR, help="каталог авторов")
+    parser.add_argument("--target", type=Path, default=None, help="каталог библиотеки (по умолчанию — рядом с пакетом)")
+    parser.add_argument("--fragment-size", type=int, default=FRAGMENT_SIZE, help="размер фрагмента в символах")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="число процессов")
+    args = parser.parse_args(argv)
+    target = args.target or library_dir()
+    count = build_reference_library(args.authors or None, args.authors_dir, target,
+                                    fragment_size=args.fragment_size, jobs=args.jobs)
+    print(f"{count} фрагментов: {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Инкрементальная транскрипция редактируемого текста: TranscriptionSession.
+
+Когда в длинном стихотворении меняется одна строка, transcribe заново
+расставляет ударения (теггер spaCy) и прогоняет все стадии конвейера по
+всему тексту. Сессия хранит для каждой строки её ударения, транскрипцию
+и счётчики фонем. При правке заново обрабатываются только изменённые строки,
+а суммарные счётчики обновляются на разность. Поэтому спектр после правки
+считается за время, пропорциональное правке, а не длине текста.
+
+Строки транскрибируются так же, как фрагменты transcribe_stream: правила
+конвейера не переходят через перевод строки, и от соседей строка зависит
+только через свои края. Значение имеет, есть ли перед строкой текст
+(йотация и ([^`])его\\b смотрят на символ перед словом) и что идёт после
+неё (правило {звонкий}$ срабатывает перед последним переводом строки
+текста). Эти признаки хранятся вместе со строкой. Если правка их меняет
+(например, после последней строки дописали новую), соседняя строка
+транскрибируется заново по сохранённым ударениям, без теггера.
+Транскрипция совпадает с transcribe всего текста, кроме контекста теггера
+spaCy: ударения расставляются по строкам.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+import ruphonetic
+from ruphonetic import instrumentation
+from ruphonetic import transcriptor
+from ruphonetic.accentuation import stress
+from ruphonetic.groupings import GroupingInput, compile_grouping
+from ruphonetic.phonemes import N_PHONEMES, PhonemeSequence, spectre_from_counts
+
+# Признаки краёв строки: (есть ли текст перед строкой, окончание источника).
+# Окончание: "" — последняя строка текста, "\n" — после строки идут только
+# пустые строки, "\n " — дальше есть текст (пробел, как в stream_sources,
+# не даёт правилу {звонкий}$ сработать в середине текста)
+Context = Tuple[bool, str]
+
+
+class SessionLine(NamedTuple):
+    # Исходная строка
+    text: str
+    # Строка с ударениями в нижнем регистре ("" для строки без русского текста)
+    accentuation: str
+    # Транскрипция строки вместе с завершающим переводом строки
+    transcription: str
+
+
+class _Line:
+    __slots__ = ("text", "source", "accentuation", "context", "transcription", "counts")
+
+    def __init__(self, text: str):
+        self.text = text
+        # Строка после preprocess_text; пустая строка в тексте схлопывается
+        # с соседним переводом строки и в транскрипцию не попадает
+        self.source = stress.preprocess_text(text)
+        self.accentuation = ""
+        self.context: Optional[Context] = None
+        self.transcription = ""
+        self.counts: Optional[np.ndarray] = None
+
+
+def _accentuate(sources: List[str]) -> List[str]:
+    """Ударения для набора строк, каждая строка — отдельный документ."""
+    if len(sources) > 1 and stress.get_mode() == "spacy":
+        # Строки размечаются по отдельности, но одним прогоном nlp.pipe
+        return [text.lower() for text in stress.accentuate_many(sources, text_is_preprocessed=True)]
+    return [instrumentation.run_stage("accentuate", transcriptor.accentuate, source, counted=True) for source in sources]
+
+
+class TranscriptionSession:
+    """
+    Транскрипция и счётчики фонем текста, который правится по строкам.
+    Правки — replace_lines, set_line, insert_lines, delete_lines или
+    update с новым текстом целиком. Результаты — transcription, counts,
+    sound_spectre, sound_spectre_grouped и spectre для своей группировки.
+    Сессия не потокобезопасна.
+    """
+
+    def __init__(self, text: str = "", simplify: bool = False, engine: str = "regex"):
+        """
+        :param text: исходный текст
+        :param simplify: применять ли упрощённые правила (на счётчики фонем
+            не влияет: они всегда считаются по упрощённой транскрипции)
+        :param engine: движок транскрипции, см. transcribe
+        """
+        transcriptor.check_engine(engine)
+        self.simplify = simplify
+        self.engine = engine
+        self._lines: List[_Line] = []
+        self._counts = np.zeros(N_PHONEMES, dtype=np.int64)
+        self._transcription: Optional[str] = None
+        self.replace_lines(0, 0, text)
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @property
+    def lines(self) -> List[str]:
+        return [line.text for line in self._lines]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self._lines)
+
+    def line(self, index: int) -> SessionLine:
+        """Ударения и транскрипция строки с номером index."""
+        line = self._lines[index]
+        return SessionLine(line.text, line.accentuation, line.transcription)
+
+    @property
+    def transcription(self) -> str:
+        """Транскрипция всего текста (склеивается при первом обращении после правки)."""
+        if self._transcription is None:
+            self._transcription = self._join()
+        return self._transcription
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Счётчики фонем всего текста (вектор по phonemes.PHONEMES)."""
+        return self._counts.copy()
+
+    def sound_spectre(self) -> Dict[str, float]:
+        """
+        Спектр, как у ruphonetic.sound_spectre; при равных долях фонемы
+        идут в порядке phonemes.PHONEMES, а не первого вхождения.
+        """
+        return spectre_from_counts(self._counts)
+
+    def sound_spectre_grouped(self) -> Dict[str, float]:
+        """Групповой спектр, как у ruphonetic.sound_spectre_grouped."""
+        return ruphonetic._grouped_spectre(self._counts)
+
+    def spectre(self, grouping: GroupingInput) -> Dict[str, float]:
+        """Доли групп своей группировки, как у sound_spectre_grouped_custom."""
+        return compile_grouping(grouping).spectre(self._counts)
+
+    def replace_lines(self, start: int, end: int, lines: Union[str, Iterable[str]]) -> None:
+        """
+        Заменяет строки start..end-1 (как срез) новыми строками.
+        :param lines: список строк или текст, который делится по "\\n"
+        """
+        if not 0 <= start <= end <= len(self._lines):
+            raise IndexError(f"Неверный диапазон строк: {start}..{end} при {len(self._lines)} строках")
+        if isinstance(lines, str):
+            lines = lines.split("\n")
+        added = [_Line(text) for text in lines]
+        for line in self._lines[start:end]:
+            if line.counts is not None:
+                self._counts -= line.counts
+        filled = [line for line in added if line.source]
+        for line, accentuation in zip(filled, _accentuate([line.source for line in filled])):
+            line.accentuation = accentuation
+        self._lines[start:end] = added
+        self._transcription = None
+
+        # Новые строки транскрибируются одним вызовом конвейера. Признаки
+        # краёв, кроме них, меняются у ближайшей непустой строки перед ними,
+        # у строки сразу после них (она могла стать первой или перестать ею
+        # быть) и у последней строки (если правка в конце)
+        stop = start + len(added)
+        followed = self._followed(stop - 1)
+        filled_indices = [index for index in range(start, stop) if self._lines[index].source]
+        if filled_indices:
+            self._transcribe(filled_indices, followed)
+        previous = start - 1
+        while previous >= 0 and not self._lines[previous].source:
+            previous -= 1
+        if previous >= 0:
+            self._refresh(previous, followed or bool(filled_indices))
+        last = len(self._lines) - 1
+        if stop < last and self._lines[stop].source:
+            self._refresh(stop, self._followed(stop))
+        if stop <= last and self._lines[last].source:
+            self._refresh(last, False)
+
+    def set_line(self, index: int, text: str) -> None:
+        """Заменяет строку index (text не должен содержать переводов строк)."""
+        if not -len(self._lines) <= index < len(self._lines):
+            raise IndexError(f"Нет строки {index} при {len(self._lines)} строках")
+        index %= len(self._lines)
+        self.replace_lines(index, index + 1, [text])
+
+    def insert_lines(self, index: int, lines: Union[str, Iterable[str]]) -> None:
+        """Вставляет строки перед строкой index (len(session) — в конец)."""
+        self.replace_lines(index, index, lines)
+
+    def delete_lines(self, start: int, end: int) -> None:
+        """Удаляет строки start..end-1."""
+        self.replace_lines(start, end, [])
+
+    def update(self, text: str) -> None:
+        """
+        Переходит к новой версии текста: общие начальные и конечные строки
+        сохраняются, остальные заменяются. Сравнение строк линейно по тексту,
+        но теггер и конвейер работают только на изменённых строках.
+        """
+        lines = text.split("\n")
+        old = self._lines
+        common = min(len(old), len(lines))
+        start = 0
+        while start < common and old[start].text == lines[start]:
+            start += 1
+        end = 0
+        while end < common - start and old[-1 - end].text == lines[-1 - end]:
+            end += 1
+        if start == len(old) == len(lines):
+            return
+        self.replace_lines(start, len(old) - end, lines[start:len(lines) - end])
+
+    def _followed(self, index: int) -> bool:
+        """Есть ли непустая строка после строки index."""
+        for following in range(index + 1, len(self._lines)):
+            if self._lines[following].source:
+                return True
+        return False
+
+    def _context(self, index: int, followed: bool) -> Context:
+        if index == len(self._lines) - 1:
+            return index > 0, ""
+        return index > 0, "\n " if followed else "\n"
+
+    def _refresh(self, index: int, followed: bool) -> None:
+        """Транскрибирует непустую строку заново, если изменились её признаки краёв."""
+        if self._lines[index].context != self._context(index, followed):
+            self._transcribe([index], followed)
+
+    def _transcribe(self, indices: List[int], followed: bool) -> None:
+        """
+        Транскрибирует непустые строки indices, идущие подряд среди непустых
+        строк, одним вызовом конвейера и делит результат по переводам строк.
+        :param followed: есть ли непустая строка после последней из них
+        """
+        lines = [self._lines[index] for index in indices]
+        ending = self._context(indices[-1], followed)[1]
+        after_newline = indices[0] > 0
+        # Как в transcriptor.transcribe_source: первой строке возвращается
+        # перевод строки перед ней, чтобы правила видели начало строки, а не текста
+        source = ("\n" if after_newline else "") + "\n".join(line.accentuation for line in lines) + ending
+        result = transcriptor.transcribe_accentuated(source, simplify=self.simplify, engine=self.engine)
+        pieces = (result[1:] if after_newline else result).split("\n")
+        for position, (index, line) in enumerate(zip(indices, lines)):
+            if line.counts is not None:
+                self._counts -= line.counts
+            # Перевод строки после последней строки есть, только если окончание не пустое
+            newline = "\n" if position < len(lines) - 1 or ending else ""
+            line.transcription = pieces[position] + newline
+            line.context = self._context(index, position < len(lines) - 1 or followed)
+            simplified = line.transcription if self.simplify else transcriptor.simplify_transcription(line.transcription)
+            line.counts = PhonemeSequence.from_transcription(simplified).counts()
+            self._counts += line.counts
+        self._transcription = None
+
+    def _join(self) -> str:
+        filled = [index for index, line in enumerate(self._lines) if line.source]
+        if not filled:
+            # В тексте без русских букв остаётся только перевод строки
+            return "\n" if len(self._lines) > 1 else ""
+        # Пустые строки в начале текста схлопываются в один перевод строки
+        head = "\n" if filled[0] > 0 else ""
+        return head + "".join(self._lines[index].transcription for index in filled)
@@ -0,0 +1,130 @@
+"""
+Определение автора с ранней остановкой: identify_author_streaming.
+
+Текст транскрибируется потоком по фрагментам (transcribe_stream), счётчики
+фонем накапливаются, и после каждого фрагмента сходство со всеми авторами
+пересчитывается по текущему спектру. Чтение прекращается, когда лидер не
+меняется, а отрыв лидера от второго места (разность сходств) несколько
+фрагментов подряд меняется не больше чем на долю tolerance от самого
+отрыва: для длинной рукописи рейтинг обычно устанавливается задолго до
+конца текста. Допуск относительный, потому что сходства спектров близки
+к 1 и отрывы малы, особенно у группового спектра.
+"""
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+import numpy as np
+
+import ruphonetic
+from ruphonetic.author_index import get_author_index
+from ruphonetic.phonemes import N_PHONEMES, PhonemeSequence, spectre_from_counts
+
+# Фрагменты меньше, чем у transcribe_stream: чем чаще пересчитывается
+# рейтинг, тем раньше можно остановиться
+CHUNK_SIZE = 20000
+
+
+class StreamIdentification(NamedTuple):
+    # {автор: сходство} по убыванию сходства, как у identify_author_by_sound_spectre
+    scores: Dict[str, float]
+    # Символов входа прочитано (с упреждением не больше одного фрагмента)
+    chars_read: int
+    # Фонем в учтённой транскрипции
+    phonemes: int
+    # Фрагментов транскрибировано
+    chunks: int
+    # Отрыв лидера от второго места на момент остановки
+    margin: float
+    # Учтён ли весь текст (False — остановка по устойчивости рейтинга,
+    # когда вход ещё не прочитан до конца)
+    complete: bool
+
+
+class _CountingReader:
+    """Куски входа по мере чтения с подсчётом прочитанных символов."""
+
+    def __init__(self, text: Union[str, Iterable[str]], chunk_size: int):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.chars = 0
+        # Вход прочитан до конца (transcribe_stream читает с упреждением)
+        self.exhausted = False
+
+    def __iter__(self) -> Iterator[str]:
+        pieces = self.text
+        if isinstance(pieces, str):
+            # Строку отдаём кусками, чтобы не «прочитать» её всю сразу
+            text, size = pieces, self.chunk_size
+            pieces = (text[i:i + size] for i in range(0, len(text), size))
+        for piece in pieces:
+            self.chars += len(piece)
+            yield piece
+        self.exhausted = True
+
+
+def identify_author_streaming(
+    text: Union[str, Iterable[str]],
+    grouped: bool = False,
+    engine: str = "regex",
+    top_k: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    tolerance: float = 0.1,
+    patience: int = 3,
+    min_chars: int = 0
+) -> StreamIdentification:
+    """
+    Определяет автора, читая текст фрагментами и останавливаясь, как только
+    рейтинг устойчив: patience фрагментов подряд лидер тот же, а отрыв лидера
+    от второго места изменился не больше чем на tolerance * отрыв.
+    :param text: строка или поток кусков текста (например, открытый файл)
+    :param chunk_size: примерный размер фрагмента в символах
+    :param tolerance: допустимое относительное изменение отрыва лидера
+        между фрагментами (меньше — дольше читать, но надёжнее)
+    :param patience: сколько фрагментов подряд рейтинг должен быть устойчив
+    :param min_chars: не останавливаться раньше, чем прочитано столько символов
+    :return: StreamIdentification — рейтинг авторов и сколько текста прочитано;
+        если авторов нет, текст не читается, а рейтинг пуст, как у
+        identify_author_by_sound_spectre
+    """
+    if patience < 1:
+        raise ValueError("patience должен быть положительным")
+    index = get_author_index(grouped)
+    if not len(index):
+        return StreamIdentification(scores={}, chars_read=0, phonemes=0, chunks=0, margin=0.0, complete=False)
+    reader = _CountingReader(text, chunk_size)
+    transcribed = ruphonetic._transcribed_chunks(
+        ruphonetic.transcribe_stream(reader, simplify=True, chunk_size=chunk_size, engine=engine), True
+    )
+    counts = np.zeros(N_PHONEMES, dtype=np.int64)
+    scores = None
+    leader, margin, stable, chunks = -1, 0.0, 0, 0
+    complete = True
+    for chunk in transcribed:
+        chunks += 1
+        counts += PhonemeSequence.from_transcription(chunk).counts()
+        if not counts.any():
+            continue
+        spectre = ruphonetic._grouped_spectre(counts) if grouped else spectre_from_counts(counts)
+        vectors, norms = index.vectorize([spectre])
+        scores = index.scores(vectors, norms)[0]
+        order = np.argsort(-scores, kind="stable")
+        new_margin = float(scores[order[0]] - scores[order[1]]) if len(order) > 1 else 0.0
+        if order[0] == leader and abs(new_margin - margin) <= tolerance * abs(new_margin):
+            stable += 1
+        else:
+            stable = 0
+        leader, margin = order[0], new_margin
+        # Если вход уже прочитан до конца, останавливаться незачем: осталось
+        # не больше фрагмента упреждения, и рейтинг считается по всему тексту
+        if stable >= patience and reader.chars >= min_chars and not reader.exhausted:
+            complete = False
+            break
+    # Остановленный генератор закрывает и поток транскрипции
+    transcribed.close()
+    return StreamIdentification(
+        scores=index.rank(scores, top_k) if scores is not None else {},
+        chars_read=reader.chars,
+        phonemes=int(counts.sum()),
+        chunks=chunks,
+        margin=margin,
+        complete=complete,
+    )
@@ -1,8 +1,14 @@
 import re
-from typing import Match
+from collections import Counter
+from typing import Iterable, Iterator, Match, Optional, Tuple
 
 # Direct import to avoid relative import issue
 from ruphonetic.accentuation import stress
+from ruphonetic import instrumentation
+
+# Движки транскрипции: "regex" — цепочка проходов re.sub ниже,
+# "fast" — пословный движок из fast_transcriptor с тем же результатом
+ENGINES = ("regex", "fast")
 
 def apply_jotation(s: str) -> str:
     # Базовая карта звуков для йотированных гласных
@@ -114,11 +120,13 @@ def soften(s: str) -> str:
     s = soften_consonants(s)
     return s
 
-def accentuate(s: str) -> str:
+def accentuate(s: str, counters: Optional[Counter] = None) -> str:
     """
     Добавляет ударения с помощью модуля stress.
+    :param counters: если задан, в него добавляются счётчики расстановки
+        ударений (см. ruphonetic.instrumentation)
     """
-    s = stress.accentuate(s).lower()
+    s = stress.accentuate(s, counters=counters).lower()
     # Можно добавить правило для автоматического замещения 'о' без ударения, если нужно
     return s
 
@@ -192,53 +200,225 @@ def handle_sch_combinations(s: str) -> str:
     
     return s
 
-def transcribe(s: str, simplify: bool = False, verbose: bool = False) -> str:
+# Стадии классического конвейера по порядку: (имя для профилирования,
+# подпись для verbose, функция)
+STAGES = (
+    ("word_ending", "word_ending:", word_ending), # Замена окончаний
+    ("vowel_reduction", "vowel_reduction:", vowel_reduction), # Редукция безударных гласных
+    ("soften", "soften:", soften), # Смягчение согласных
+    ("apply_jotation", "jot:", apply_jotation), # Замена йотированных гласных
+    ("handle_sch_combinations", "sch: ", handle_sch_combinations),
+    ("deafen_and_sharpen", "deafen&sharpen:", deafen_and_sharpen), # Оглушение и озвончение согласных
+    ("remove_hard_sign", "hard sign:", remove_hard_sign), # Удаление твердого знака
+)
+SIMPLIFY_STAGES = (
+    ("simplify_transcription", "simplify:", simplify_transcription), # Упрощение транскрипции
+)
+
+def transcribe(s: str, simplify: bool = False, verbose: bool = False, engine: str = "regex") -> str:
     """
     Главная функция транскрибирования.
     Включает акцентуацию, замену оканчаний, мягкость, оглушение, йотирование и упрощение.
+    :param engine: "regex" (по умолчанию) или "fast" — пословный движок
+        с тем же результатом; промежуточные стадии он не печатает, а
+        транскрипции словоформ запоминает в ruphonetic.cache.word_cache
     """
+    check_engine(engine)
 
-    s = accentuate(s) # Расставляем ударения
+    s = instrumentation.run_stage("accentuate", accentuate, s, counted=True) # Расставляем ударения
     if verbose:
         print("accentuate:\n", s, "\n")
 
-    
-    s = word_ending(s) # Замена окончаний
-    if verbose:
-        print("word_ending:\n", s, "\n")
+    return transcribe_accentuated(s, simplify=simplify, verbose=verbose, engine=engine)
 
-    s = vowel_reduction(s) # Редукция безударных гласных
-    if verbose:
-        print("vowel_reduction:\n", s, "\n")
+def check_engine(engine: str) -> None:
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок транскрипции: {engine}. Доступны: {', '.join(ENGINES)}")
 
-    s = soften(s) # Смягчение согласных
-    if verbose:
-        print("soften:\n", s, "\n")
-
-    s = apply_jotation(s) # Замена йотированных гласных
-    if verbose:
-        print("jot:\n", s, "\n")
-
-    s = handle_sch_combinations(s)
-    if verbose:
-        print("sch: \n", s, "\n")
-
-    s = deafen_and_sharpen(s) # Оглушение и озвончение согласных
-    if verbose:
-        print("deafen&sharpen:\n", s, "\n")
-
-    s = remove_hard_sign(s) # Удаление твердого знака
-    if verbose:
-        print("hard sign:\n", s, "\n")
-
-    if simplify:
-        s = simplify_transcription(s) # Упрощение транскрипции
+def transcribe_accentuated(s: str, simplify: bool = False, verbose: bool = False, engine: str = "regex") -> str:
+    """
+    Стадии transcribe после расстановки ударений: s — результат accentuate
+    (текст с ударениями в нижнем регистре).
+    """
+    check_engine(engine)
+    if engine == "fast":
+        # fast_transcriptor сам опирается на правила этого модуля
+        from ruphonetic import fast_transcriptor
+        from ruphonetic.cache import word_cache
+        return fast_transcriptor.transcribe_accentuated(s, simplify=simplify, cache=word_cache)
+
+    stages = STAGES + SIMPLIFY_STAGES if simplify else STAGES
+    for name, label, function in stages:
+        s = instrumentation.run_stage(name, function, s)
         if verbose:
-            print("simplify:\n", s, "\n")
+            print(label + "\n", s, "\n")
+
+    return instrumentation.run_stage("cleanup", cleanup_spaces, s)
 
-    # Убираем начальные и лишние пробелы
+def cleanup_spaces(s: str) -> str:
+    """Убирает начальные и лишние пробелы"""
     s = re.sub("^ ", "", s)
     s = re.sub("\n ", "\n", s)
     s = re.sub(r"[^\S\r\n]+", " ", s)
     return s
 
+
+# Размер фрагмента (в символах) для потоковой транскрипции. Конвейер выше
+# работает с целой строкой, поэтому память ограничена размером фрагмента.
+STREAM_CHUNK_SIZE = 100000
+
+def _safe_space(buf: str, space: int) -> bool:
+    """
+    Пробел, на котором не срабатывают межсловные правила (в/с перед
+    следующим словом, его/ого в начале слова).
+    """
+    if space + 4 > len(buf):
+        # Следующее слово дочитано не полностью: «е» может оказаться «его»
+        return False
+    before = buf[space - 1].lower()
+    word = buf[space + 1:space + 4].lower()
+    # Пробел перед пробелом не годится: повторные пробелы схлопнутся,
+    # и следующее слово окажется в начале фрагмента
+    return word[0].isalpha() and word not in ("его", "ого") and (
+        word[0] in "аеёиоуыэюя"
+        or (before in "абгдеёжийклмнопрстуфхцчшщъыьэюя" and before not in "взс")
+    )
+
+def _find_cut(buf: str, start: int, chunk_size: int) -> Optional[int]:
+    """
+    Находит место разреза буфера примерно в chunk_size символах от start.
+    Предпочтение: граница строфы во второй половине окна, конец строки,
+    безопасный пробел (см. _safe_space), затем — за пределами окна —
+    ближайший безопасный пробел или конец строки. Другие пробелы и места
+    внутри слова не годятся: на них транскрипция фрагментов разошлась бы
+    с транскрипцией цельного текста. Если в буфере разрезать негде,
+    возвращается None и нужно дочитать вход.
+    """
+    end = start + chunk_size
+    stanza = buf.rfind("\n\n", start, end)
+    if stanza >= start + chunk_size // 2:
+        return stanza + 2
+    line = buf.rfind("\n", start, end)
+    if line >= start:
+        return line + 1
+    space = buf.rfind(" ", start, end)
+    while space > start:
+        if _safe_space(buf, space):
+            return space + 1
+        space = buf.rfind(" ", start, space)
+    # Окно — часть одной строки без безопасных пробелов: фрагмент
+    # продлевается до ближайшего разреза после окна
+    line = buf.find("\n", end)
+    space = buf.find(" ", end, line if line >= 0 else len(buf))
+    while space >= 0:
+        if _safe_space(buf, space):
+            return space + 1
+        space = buf.find(" ", space + 1, line if line >= 0 else len(buf))
+    if line >= 0:
+        return line + 1
+    return None
+
+def split_stream(texts: Iterable[str], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Нарезает поток текста на фрагменты примерно по chunk_size символов,
+    стараясь резать по границам строф и строк. Слова не разрезаются:
+    если в окне нет перевода строки или безопасного пробела, фрагмент
+    продлевается до ближайшего такого места и получается длиннее chunk_size.
+    :param texts: итерируемый набор кусков текста (например, строки файла)
+    """
+    buf = ""
+    for piece in texts:
+        buf = buf + piece if buf else piece
+        start = 0
+        while len(buf) - start >= chunk_size:
+            cut = _find_cut(buf, start, chunk_size)
+            if cut is None:
+                break
+            yield buf[start:cut]
+            start = cut
+        buf = buf[start:]
+    if buf:
+        yield buf
+
+def _preprocessed_chunks(texts: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """
+    Предобработка фрагментов потока так, как если бы preprocess_text
+    применялся к цельному тексту: повторные переводы строк и пробелы
+    на стыке фрагментов склеиваются.
+    """
+    tail = ""
+    for chunk in split_stream(texts, chunk_size):
+        chunk = stress.preprocess_text(chunk)
+        if tail == "\n":
+            chunk = chunk.lstrip("\n")
+        elif tail == " ":
+            chunk = chunk.lstrip(" ")
+        if chunk:
+            tail = chunk[-1]
+            yield chunk
+
+def stream_sources(texts: Iterable[str], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Tuple[str, bool]]:
+    """
+    Фрагменты потока, готовые к независимой транскрипции: пары
+    (текст фрагмента, отрезан ли он после перевода строки). Контекст
+    соседних фрагментов уже учтён, поэтому фрагменты можно транскрибировать
+    в любом порядке и в разных процессах (см. transcribe_source).
+    """
+    chunks = _preprocessed_chunks(texts, chunk_size)
+    chunk: Optional[str] = next(chunks, None)
+    after_newline = False
+    while chunk is not None:
+        following = next(chunks, None)
+        source = chunk
+        if following is not None and chunk.endswith("\n"):
+            # Правило оглушения {звонкий}$ срабатывает перед последним
+            # переводом строки текста; для фрагмента из середины текста
+            # добавляем пробел, который затем уберёт очистка "\n " -> "\n"
+            source += " "
+        yield source, after_newline
+        after_newline = chunk.endswith("\n")
+        chunk = following
+
+def transcribe_source(source: str, after_newline: bool, simplify: bool = False, engine: str = "regex") -> str:
+    """Транскрибирует фрагмент из stream_sources."""
+    if after_newline:
+        # Правила вида ([^`])его\b смотрят на символ перед словом:
+        # возвращаем фрагменту перевод строки, на котором его отрезали
+        return transcribe("\n" + source, simplify=simplify, engine=engine)[1:]
+    return transcribe(source, simplify=simplify, engine=engine)
+
+def transcribe_stream(
+    texts: Iterable[str],
+    simplify: bool = False,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    engine: str = "regex"
+) -> Iterator[str]:
+    """
+    Потоковая транскрипция без ограничения на длину текста.
+    Текст режется на фрагменты по строфам/строкам, каждый фрагмент
+    транскрибируется отдельно, склейка результатов совпадает
+    с транскрипцией цельного текста (кроме контекста теггера spaCy).
+    :param texts: итерируемый набор кусков текста (строки файла, абзацы и т.п.)
+    :param simplify: применять ли упрощённые правила
+    :param chunk_size: примерный размер фрагмента в символах
+    :param engine: движок транскрипции, см. transcribe
+    :return: генератор транскрибированных фрагментов
+    """
+    return join_transcribed(
+        transcribe_source(source, after_newline, simplify=simplify, engine=engine)
+        for source, after_newline in stream_sources(texts, chunk_size)
+    )
+
+def join_transcribed(results: Iterable[str]) -> Iterator[str]:
+    """
+    Склеивает транскрипции фрагментов stream_sources (в исходном порядке)
+    так, как транскрибировался бы цельный текст.
+    """
+    after_space = False
+    for result in results:
+        if after_space:
+            # Пробелы на стыке схлопнулись бы в один в цельном тексте
+            result = result.lstrip(" ")
+        if result:
+            after_space = result.endswith(" ")
+            yield result
@@ -1,12 +1,18 @@
-import matplotlib.pylab as plt
+# matplotlib импортируется только при построении графиков,
+# чтобы не замедлять import ruphonetic
+def _pyplot():
+    import matplotlib.pylab as plt
+    return plt
 
 def show_plot(dct):
+    plt = _pyplot()
     lists = dct.items()
     x, y = zip(*lists)
     plt.plot(x, y)
     plt.show()
 
 def show_pie_plot(dct):
+    plt = _pyplot()
     labels = []
     sizes = []
 
@@ -20,6 +26,7 @@ def show_pie_plot(dct):
     plt.show()
 
 def show_bar_plot(dct):
+    plt = _pyplot()
     plt.bar(range(len(dct)), list(dct.values()), align='center')
     plt.xticks(range(len(dct)), list(dct.keys()))
     plt.show()
@@ -30,6 +30,9 @@ setup(
       'ruphonetic': ['accentuation/*.dat'],
   },
   install_requires=['numpy==1.26.4', 'spacy==3.3.0', 'matplotlib==3.5.2'],
+  entry_points={
+      'console_scripts': ['ruphonetic=ruphonetic.cli:main'],
+  },
 )
 
 
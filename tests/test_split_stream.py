@@ -0,0 +1,33 @@
+"""Нарезка потока на фрагменты (transcriptor.split_stream)."""
+import unittest
+
+from ruphonetic import transcriptor
+
+TEXT = "в лесу родилась ёлочка, в лесу она росла\nзимой и летом стройная,  его  зелёная была"
+
+
+class SplitStreamTest(unittest.TestCase):
+    def check(self, pieces, chunk_size):
+        chunks = list(transcriptor.split_stream(pieces, chunk_size))
+        self.assertEqual("".join(chunks), TEXT)
+        offset = 0
+        for chunk in chunks[:-1]:
+            offset += len(chunk)
+            following = TEXT[offset:]
+            # Разрез — только после перевода строки или после пробела перед
+            # буквой, но не перед «его» и не после «в»/«с»
+            self.assertIn(chunk[-1], " \n", chunks)
+            if chunk[-1] == " ":
+                self.assertTrue(following[0].isalpha(), chunks)
+                self.assertFalse(following.startswith("его"), chunks)
+                self.assertNotIn(chunk[-2], "взс", chunks)
+
+    def test_never_cuts_inside_words(self):
+        for chunk_size in range(1, 50):
+            self.check([TEXT], chunk_size)
+            # Тот же текст, приходящий кусками по три символа
+            self.check([TEXT[i:i + 3] for i in range(0, len(TEXT), 3)], chunk_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+"""Счётчики расстановки ударений (stress.count_word) на фиксированном тексте."""
+import unittest
+from collections import Counter
+
+from ruphonetic.accentuation import stress
+
+# Маленький словарь словоформ: знак ударения ' стоит после ударной гласной
+WORDFORMS = {
+    "в": [{"accentuated": "в"}],
+    "лесу": [{"accentuated": "ле'су"}, {"accentuated": "лесу'"}],
+    "родилась": [{"accentuated": "родила'сь"}],
+    "ёлочка": [{"accentuated": "ёлочка"}],
+    "к": [{"accentuated": "к"}],
+    "ней": [{"accentuated": "ней"}],
+}
+
+
+class StressCountersTest(unittest.TestCase):
+    def test_dictionary_mode_counters(self):
+        counters = Counter()
+        # Строчные слова: теггер spaCy в режиме "dictionary" не нужен
+        result = stress.process_dictionary_first("в лесу родилась ёлочка\nк ней пришёл кот", WORDFORMS, counters)
+        self.assertEqual(result, "в лесу родил`ась `ёлочка\nк н`ей пришёл к`от")
+        # «в» и «к» без гласных ударения не несут и неоднозначными не считаются
+        self.assertEqual(counters, Counter(dictionary_hits=6, dictionary_misses=2, ambiguous_unstressed=1))
+
+    def test_vowelless_word_is_not_ambiguous(self):
+        counters = Counter()
+        word = stress.dictionary_word("с", {"с": [{"accentuated": "с"}]})
+        stress.count_word(counters, word, stress.accentuate_word(word))
+        self.assertEqual(counters, Counter(dictionary_hits=1))
+
+
+if __name__ == "__main__":
+    unittest.main()